@@ -1,11 +1,189 @@
 // app/api/parking-services/parking-import/route.ts
 import { NextResponse } from "next/server";
 import { spawn } from "child_process";
+import http from "http";
 import path from "path";
 import fs from "fs/promises";
 import { auth } from "@/auth";
 import { db } from "@/lib/db";
 
+type ImportEvent = {
+  event: string;
+  elapsedMs?: number;
+  [key: string]: unknown;
+};
+
+type ImportRun = {
+  code: number | null;
+  output: string;
+  error: string;
+  events: ImportEvent[];
+};
+
+type EventHandler = (event: ImportEvent) => void;
+
+// Splits a chunked stream into lines, keeping the unfinished tail for the next chunk
+function lineSplitter(onLine: (line: string) => void) {
+  let buffer = "";
+  return {
+    push(chunk: string) {
+      buffer += chunk;
+      const lines = buffer.split("\n");
+      buffer = lines.pop() ?? "";
+      lines.filter(Boolean).forEach(onLine);
+    },
+    end() {
+      if (buffer) onLine(buffer);
+      buffer = "";
+    },
+  };
+}
+
+// Resident importer started with `parking_service_processor.py --serve`
+const IMPORT_DAEMON_SOCKET = process.env.PARKING_IMPORT_SOCKET;
+const IMPORT_DAEMON_URL = process.env.PARKING_IMPORT_URL;
+// Longest silence tolerated on the daemon connection; it sends an event for every file it works on
+const IMPORT_DAEMON_TIMEOUT_MS = Number(process.env.PARKING_IMPORT_TIMEOUT_MS || 10 * 60 * 1000);
+
+function runImportViaDaemon(userId: string, onEvent: EventHandler): Promise<ImportRun> {
+  return new Promise((resolve, reject) => {
+    const payload = JSON.stringify({ userId });
+    const target = IMPORT_DAEMON_SOCKET
+      ? { socketPath: IMPORT_DAEMON_SOCKET, path: "/import" }
+      : (() => {
+          const url = new URL("/import", IMPORT_DAEMON_URL);
+          return { hostname: url.hostname, port: url.port, path: url.pathname };
+        })();
+
+    let output = "";
+    const events: ImportEvent[] = [];
+    let settled = false;
+    const settle = (finish: () => void) => {
+      if (settled) return;
+      settled = true;
+      finish();
+    };
+    // Before any event the import has not started, so the caller may still spawn the processor
+    const fail = (error: Error) =>
+      settle(() =>
+        events.length
+          ? resolve({ code: 1, output, error: `Import daemon connection lost: ${error.message}`, events })
+          : reject(error)
+      );
+
+    const request = http.request(
+      {
+        ...target,
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "Content-Length": Buffer.byteLength(payload),
+        },
+      },
+      (response) => {
+        // The daemon streams one JSON event per line and ends with "done" or "error"
+        const lines = lineSplitter((line) => {
+          output += line + "\n";
+          if (response.statusCode !== 200) return;
+          try {
+            const event = JSON.parse(line) as ImportEvent;
+            events.push(event);
+            onEvent(event);
+          } catch {
+            // A cut-off or garbled line stays in output only
+          }
+        });
+        response.setEncoding("utf8");
+        response.on("data", (chunk) => lines.push(chunk));
+        response.on("aborted", () => fail(new Error("import daemon closed the connection")));
+        response.on("error", fail);
+        response.on("end", () => {
+          lines.end();
+          if (response.statusCode !== 200) {
+            settle(() => resolve({ code: 1, output, error: output, events }));
+            return;
+          }
+          const failed = events.find((event) => event.event === "error");
+          const done = events.some((event) => event.event === "done");
+          settle(() =>
+            resolve({
+              code: failed || !done ? 1 : 0,
+              output,
+              error: failed ? String(failed.message) : done ? "" : "Import daemon ended without a result",
+              events,
+            })
+          );
+        });
+      }
+    );
+    request.setTimeout(IMPORT_DAEMON_TIMEOUT_MS, () => {
+      request.destroy(new Error(`no response from the import daemon for ${IMPORT_DAEMON_TIMEOUT_MS} ms`));
+    });
+    request.on("error", fail);
+    request.end(payload);
+  });
+}
+
+function runImportViaSpawn(
+  scriptPath: string,
+  userId: string,
+  uploadedFilePath: string | undefined,
+  onEvent: EventHandler
+): Promise<ImportRun> {
+  return new Promise((resolve) => {
+    // --progress-json: stdout carries JSON-lines events, logging goes to stderr
+    const pythonProcess = spawn("python", [scriptPath, userId, "--progress-json"], {
+      env: {
+        ...process.env,
+        SUPABASE_PASSWORD: process.env.SUPABASE_PASSWORD || "",
+        UPLOADED_FILE_PATH: uploadedFilePath || "",
+      },
+    });
+
+    let combinedOutput = "";
+    let errorOutput = "";
+    const events: ImportEvent[] = [];
+
+    const stdoutLines = lineSplitter((line) => {
+      try {
+        const event = JSON.parse(line) as ImportEvent;
+        events.push(event);
+        onEvent(event);
+      } catch {
+        // Anything that is not an event (e.g. a library printing to stdout) is kept as log output
+        combinedOutput += line + "\n";
+      }
+    });
+
+    pythonProcess.stdout.on("data", (data) => stdoutLines.push(data.toString()));
+
+    pythonProcess.stderr.on("data", (data) => {
+      errorOutput += data.toString();
+      combinedOutput += data.toString();
+    });
+
+    pythonProcess.on("close", (code) => {
+      stdoutLines.end();
+      resolve({ code, output: combinedOutput, error: errorOutput, events });
+    });
+  });
+}
+
+async function runImport(
+  scriptPath: string,
+  userId: string,
+  uploadedFilePath: string | undefined,
+  onEvent: EventHandler = () => {}
+): Promise<ImportRun> {
+  if (IMPORT_DAEMON_SOCKET || IMPORT_DAEMON_URL) {
+    try {
+      return await runImportViaDaemon(userId, onEvent);
+    } catch (error) {
+      console.warn("Parking import daemon unavailable, spawning the processor:", error);
+    }
+  }
+  return runImportViaSpawn(scriptPath, userId, uploadedFilePath, onEvent);
+}
 
 export async function POST(req: Request) {
   const session = await auth();
@@ -73,61 +251,67 @@ export async function POST(req: Request) {
       });
     }
 
-    return new Promise((resolve) => {
-      const pythonProcess = spawn("python", [scriptPath, user.id], {
-        env: {
-          ...process.env,
-          SUPABASE_PASSWORD: process.env.SUPABASE_PASSWORD || "",
-          UPLOADED_FILE_PATH: uploadedFilePath || "",
-        },
-      });
+    const finishImport = async ({ code, output, error, events }: ImportRun) => {
+      const isSuccess = code === 0;
 
-      let combinedOutput = "";
-      let errorOutput = "";
+      // Update import status ONLY if service ID provided
+      if (body.parkingServiceId) {
+        try {
+          await prisma.parkingService.update({
+            where: { id: body.parkingServiceId },
+            data: {
+              importStatus: isSuccess ? 'success' : 'failed',
+              lastImportDate: new Date(),
+            }
+          });
+        } catch (dbError) {
+          console.error("Failed to update import status:", dbError);
+        }
+      }
 
-      pythonProcess.stdout.on("data", (data) => {
-        combinedOutput += data.toString();
-      });
+      // REMOVED SERVICE CREATION LOGIC HERE
+      // Service creation now only happens elsewhere
 
-      pythonProcess.stderr.on("data", (data) => {
-        errorOutput += data.toString();
-        combinedOutput += data.toString();
-      });
+      return {
+        success: isSuccess,
+        output,
+        error,
+        events,
+        exitCode: code,
+        userId: user.id,
+        userEmail,
+        fileInfo
+      };
+    };
 
-      pythonProcess.on("close", async (code) => {
-        const isSuccess = code === 0;
-        
-        // Update import status ONLY if service ID provided
-        if (body.parkingServiceId) {
+    // Clients asking for NDJSON get each progress event as it happens, then a final "result" line
+    if (req.headers.get("accept")?.includes("application/x-ndjson")) {
+      const encoder = new TextEncoder();
+      const stream = new ReadableStream({
+        async start(controller) {
+          const send = (payload: object) => controller.enqueue(encoder.encode(JSON.stringify(payload) + "\n"));
           try {
-            await prisma.parkingService.update({
-              where: { id: body.parkingServiceId },
-              data: {
-                importStatus: isSuccess ? 'success' : 'failed',
-                lastImportDate: new Date(),
-              }
-            });
-          } catch (dbError) {
-            console.error("Failed to update import status:", dbError);
+            const run = await runImport(scriptPath, user.id, uploadedFilePath, send);
+            const { events, ...result } = await finishImport(run);
+            send({ event: "result", ...result, eventCount: events.length });
+          } catch (streamError) {
+            console.error("Error in parking import stream:", streamError);
+            send({ event: "result", success: false, error: String(streamError) });
+          } finally {
+            controller.close();
           }
-        }
-
-        // REMOVED SERVICE CREATION LOGIC HERE
-        // Service creation now only happens elsewhere
-
-        resolve(
-          NextResponse.json({
-            success: isSuccess,
-            output: combinedOutput,
-            error: errorOutput,
-            exitCode: code,
-            userId: user.id,
-            userEmail,
-            fileInfo
-          })
-        );
+        },
       });
-    });
+      return new Response(stream, {
+        headers: {
+          "Content-Type": "application/x-ndjson; charset=utf-8",
+          "Cache-Control": "no-cache",
+        },
+      });
+    }
+
+    const run = await runImport(scriptPath, user.id, uploadedFilePath);
+    return NextResponse.json(await finishImport(run));
 
   } catch (error) {
     console.error("Error in parking import:", error);
@@ -24,6 +24,40 @@ interface FileProcessingStatus {
   logs: string[]; // Store logs for each file
 }
 
+interface ImportEvent {
+  event: string;
+  elapsedMs?: number;
+  ms?: number;
+  [key: string]: any;
+}
+
+const formatMs = (ms?: number) => (ms === undefined ? "" : ` (${ms < 1000 ? `${Math.round(ms)} ms` : `${(ms / 1000).toFixed(2)} s`})`);
+
+// One log line per progress event streamed by the import route
+const describeImportEvent = (event: ImportEvent): string | null => {
+  const at = event.elapsedMs !== undefined ? `[${(event.elapsedMs / 1000).toFixed(2)}s] ` : "";
+  switch (event.event) {
+    case "file_started":
+      return `${at}📄 Početak obrade: ${event.file}`;
+    case "rows_parsed":
+      return `${at}🧮 Pročitano redova: ${event.rows}${formatMs(event.ms)}`;
+    case "dimensions_resolved":
+      return `${at}🔗 Servis ${event.provider}: ${event.services} usluga${formatMs(event.ms)}`;
+    case "rows_loaded":
+      return `${at}💾 Upisano${event.file ? ` (${event.file})` : ""}: ${event.inserted} novih, ${event.updated} ažuriranih, ${event.unchanged ?? 0} nepromenjenih, ${event.deleted ?? 0} obrisanih, ${event.errors} grešaka${event.rejected ? `, ${event.rejected} odbijenih` : ""}${formatMs(event.ms)}`;
+    case "file_moved":
+      return `${at}📁 Fajl premešten: ${event.file}${formatMs(event.ms)}`;
+    case "file_skipped":
+      return `${at}⏭️ Preskočeno (već importovano): ${event.file}`;
+    case "file_failed":
+      return `${at}❌ Greška u fajlu ${event.file}: ${event.error}`;
+    case "run_completed":
+      return `${at}🏁 Obrada završena`;
+    default:
+      return null;
+  }
+};
+
 export function ParkingServiceProcessorForm() {
   const { data: session } = useSession();
   const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
@@ -93,7 +127,7 @@ export function ParkingServiceProcessorForm() {
       updateFileStatus(file.name, 'processing', '🔄 Pokrećem import...', '🔄 Pokrećem import skriptu...');
       const importRes = await fetch("/api/parking-services/parking-import", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", Accept: "application/x-ndjson" },
         body: JSON.stringify({
           userEmail: session.user.email,
           uploadedFilePath: uploadResult.fileInfo.filePath,
@@ -101,19 +135,41 @@ export function ParkingServiceProcessorForm() {
         }),
       });
 
-      const result = await importRes.json();
-
-      if (importRes.ok && result.success) {
-        // Add each log line from the result
-        const outputLines = result.output?.split("\n").filter(Boolean) || [];
-        outputLines.forEach(line => {
-          updateFileStatus(file.name, 'processing', '🔄 Obrada...', line);
-        });
+      let result: any = null;
+      if (importRes.ok && importRes.body) {
+        // Progress events arrive one JSON object per line while the import runs
+        const reader = importRes.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        const handleLine = (line: string) => {
+          const event: ImportEvent = JSON.parse(line);
+          if (event.event === "result") {
+            result = event;
+            return;
+          }
+          const log = describeImportEvent(event);
+          if (log) {
+            updateFileStatus(file.name, 'processing', '🔄 Obrada...', log);
+          }
+        };
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split("\n");
+          buffer = lines.pop() ?? "";
+          lines.filter(Boolean).forEach(handleLine);
+        }
+        if (buffer.trim()) handleLine(buffer);
+      } else {
+        result = await importRes.json();
+      }
 
+      if (importRes.ok && result?.success) {
         updateFileStatus(file.name, 'completed', '✅ Uspešno importovano', '✅ Import uspešno završen!', result.fileInfo?.lastReportPath);
       } else {
-        const errorLog = result.error || "Nepoznata greška";
-        const outputLines = result.output?.split("\n").filter(Boolean) || [];
+        const errorLog = result?.error || "Nepoznata greška";
+        const outputLines: string[] = result?.output?.split("\n").filter(Boolean) || [];
         outputLines.forEach(line => {
           updateFileStatus(file.name, 'processing', '🔄 Obrada...', line);
         });
@@ -0,0 +1,198 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import parking_service_processor as processor
+from generate_parking_report import generate_reports
+
+STAGES = ["read", "parse", "dimensions_cold", "dimensions_warm", "normalize", "load_insert", "load_update"]
+
+def git_commit():
+    """Current git commit, so results can be lined up with releases"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def timed(stage_times, stage, func, *args):
+    """Run func and add its wall time to stage_times[stage]"""
+    started = time.perf_counter()
+    result = func(*args)
+    stage_times[stage] = stage_times.get(stage, 0.0) + time.perf_counter() - started
+    return result
+
+def load(frame, load_mode):
+    """Load an already sanitized frame with the selected loader, skipping import_to_postgresql's own normalization"""
+    conn = processor.get_db_connection()
+    try:
+        if load_mode == "bulk":
+            return processor.bulk_load_parking_transactions(conn, frame)
+        if load_mode == "delta":
+            return processor.delta_load_parking_transactions(conn, frame)
+        return processor.upsert_parking_transactions(conn, frame)
+    finally:
+        processor.return_db_connection(conn)
+
+def cleanup(created):
+    """Delete the rows a benchmark run created in the local database"""
+    conn = processor.get_db_connection()
+    try:
+        cur = conn.cursor()
+        if created['parking_services']:
+            cur.execute('DELETE FROM "ParkingTransaction" WHERE "parkingServiceId" = ANY(%s)', (created['parking_services'],))
+            cur.execute('DELETE FROM "ParkingMonthlyRollup" WHERE "parkingServiceId" = ANY(%s)', (created['parking_services'],))
+            cur.execute('DELETE FROM "Contract" WHERE "parkingServiceId" = ANY(%s)', (created['parking_services'],))
+        if created['service_contracts']:
+            cur.execute('DELETE FROM "ServiceContract" WHERE "id" = ANY(%s)', (created['service_contracts'],))
+        if created['services']:
+            cur.execute('DELETE FROM "Service" WHERE "id" = ANY(%s)', (created['services'],))
+        if created['parking_services']:
+            cur.execute('DELETE FROM "ParkingService" WHERE "id" = ANY(%s)', (created['parking_services'],))
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        logging.error(f"Benchmark cleanup failed: {e}")
+        conn.rollback()
+    finally:
+        processor.return_db_connection(conn)
+
+def run_once(paths, context, load_mode):
+    """Time every pipeline stage once over the given reports"""
+    stage_times = {}
+    created = {'parking_services': [], 'services': [], 'service_contracts': []}
+    context.dimensions.invalidate()
+
+    parsed = []
+    for path in paths:
+        sheet = timed(stage_times, "read", processor.read_report_sheet, path)
+        records, codes = timed(stage_times, "parse", processor.parse_report_frame, sheet)
+        provider = processor.extract_parking_provider(os.path.basename(path))
+        parsed.append((provider, records, codes))
+
+    frames = []
+    conn = processor.get_db_connection()
+    try:
+        for provider, records, codes in parsed:
+            dimensions = timed(stage_times, "dimensions_cold", context.dimensions.resolve, conn, provider, codes)
+            if dimensions['created']['parking_service']:
+                created['parking_services'].append(dimensions['parking_service_id'])
+            created['services'].extend(service_id for _, service_id in dimensions['created']['services'])
+            created['service_contracts'].extend(sc_id for _, sc_id in dimensions['created']['service_contracts'])
+
+            frame = records.copy()
+            frame.insert(0, 'parkingServiceId', dimensions['parking_service_id'])
+            frame.insert(1, 'serviceId', frame['serviceCode'].map(dimensions['service_ids']))
+            frames.append(frame.drop(columns=['serviceCode']))
+
+        # Second pass is served from the resolver cache
+        for provider, records, codes in parsed:
+            timed(stage_times, "dimensions_warm", context.dimensions.resolve, conn, provider, codes)
+    finally:
+        processor.return_db_connection(conn)
+
+    all_records = pd.concat(frames, ignore_index=True)
+    sanitized = timed(stage_times, "normalize", processor.sanitize_parking_frame, all_records)
+    timed(stage_times, "load_insert", load, sanitized, load_mode)
+    timed(stage_times, "load_update", load, sanitized, load_mode)
+    return stage_times, len(sanitized), created
+
+def summarize(runs, rows):
+    """Per-stage min/median/max seconds and throughput"""
+    stages = {}
+    for stage in STAGES:
+        values = [run[stage] for run in runs if stage in run]
+        if not values:
+            continue
+        median = statistics.median(values)
+        stages[stage] = {
+            'seconds_min': round(min(values), 6),
+            'seconds_median': round(median, 6),
+            'seconds_max': round(max(values), 6),
+            'rows_per_second': round(rows / median, 1) if median else None
+        }
+    return stages
+
+def main():
+    """Generate synthetic reports, time each pipeline stage and write the results as JSON"""
+    parser = argparse.ArgumentParser(description="Stage-level benchmark of the parking import pipeline")
+    parser.add_argument("--providers", type=int, default=5)
+    parser.add_argument("--services", type=int, default=10, help="services per provider")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--code-base", type=int, default=7000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--load-mode", choices=["bulk", "delta", "rows"], default="bulk")
+    parser.add_argument("--user-id", help="user recorded on auto-created contracts (default: system user)")
+    parser.add_argument("--keep-data", action="store_true", help="keep the rows the benchmark created")
+    parser.add_argument("--allow-remote", action="store_true", help="allow running against a non-local database")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(os.getcwd(), "scripts/data/benchmarks", f"parking-{datetime.now():%Y%m%d-%H%M%S}.json")
+    )
+    args = parser.parse_args()
+
+    if os.getenv("USE_LOCAL_DB", "true").lower() != "true" and not args.allow_remote:
+        parser.error("the benchmark writes to the database; run it with USE_LOCAL_DB=true or pass --allow-remote")
+
+    context = processor.init_run_context(argparse.Namespace(user_id=args.user_id))
+
+    runs = []
+    rows = 0
+    try:
+        with tempfile.TemporaryDirectory() as report_dir:
+            paths = generate_reports(
+                report_dir,
+                providers=args.providers,
+                services=args.services,
+                days=args.days,
+                code_base=args.code_base
+            )
+            for i in range(args.repeat):
+                stage_times, rows, created = run_once(paths, context, args.load_mode)
+                runs.append(stage_times)
+                logging.info(f"Run {i + 1}/{args.repeat}: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in stage_times.items()))
+                if not args.keep_data or i + 1 < args.repeat:
+                    cleanup(created)
+    finally:
+        context.audit.flush()
+        processor.close_db_pool()
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'config': {
+            'providers': args.providers,
+            'services': args.services,
+            'days': args.days,
+            'repeat': args.repeat,
+            'load_mode': args.load_mode,
+            'rows': rows
+        },
+        'stages': summarize(runs, rows),
+        'runs': [{stage: round(seconds, 6) for stage, seconds in run.items()} for run in runs]
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fout:
+        json.dump(result, fout, indent=2)
+    logging.info(f"Benchmark results written to {args.output}")
+    json.dump(result['stages'], sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import calendar
+import logging
+import os
+import random
+import sys
+from datetime import date
+
+import openpyxl
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+
+GROUPS = ["prepaid", "postpaid", "TOTAL"]
+
+def report_filename(provider, report_id, year, month, days):
+    """Filename in the layout the mParking export uses"""
+    start = date(year, month, 1)
+    end = date(year, month, days)
+    return (
+        f"Servis__MicropaymentMerchantReport_SDP_mParking_{provider}_{report_id}"
+        f"__{start:%Y%m%d}_0000__{end:%Y%m%d}_2359.xlsx"
+    )
+
+def date_headers(year, month, days):
+    """Day column headers as they appear in the export, e.g. '01.05.\\n2025.'"""
+    return [f"{day:02d}.{month:02d}.\n{year}." for day in range(1, days + 1)]
+
+def generate_services(provider, services, code_base, rng):
+    """Service rows for one provider: (name, price)"""
+    zones = ["Crvena_Zona", "Zuta_Zona", "Zelena_Zona", "Dnevna_Karta", "Plava_Zona"]
+    result = []
+    for i in range(services):
+        code = code_base + i
+        name = f"S_{code}__{code}_{provider}_{zones[i % len(zones)]}"
+        price = rng.choice([33.0, 44.5, 50.0, 70.0, 80.0, 150.0])
+        result.append((name, price))
+    return result
+
+def write_report(path, provider, services, year, month, days, rng):
+    """Write one MicropaymentMerchantReport workbook: three summary sheets, then the report sheet process_excel reads"""
+    book = openpyxl.Workbook()
+    # Sheet titles are capped at 31 characters in .xlsx
+    book.active.title = f"SDP_mParking_{provider}"[:31]
+    book.create_sheet(f"VAS Report - SDP_mParking_{provider}"[:31])
+    book.create_sheet(f"VAS Prepaid - SDP_mParking_{provider}"[:31])
+    sheet = book.create_sheet(f"{provider}_SDP"[:31])
+
+    headers = date_headers(year, month, days)
+    totals = {}
+    for group in GROUPS:
+        sheet.append([f"{provider}_SDP - {group}", None, None] + headers + ["TOTAL"])
+        for name, price in services:
+            if group == "TOTAL":
+                quantities = [sum(values) for values in zip(*(totals[(g, name)] for g in GROUPS[:2]))]
+            else:
+                # Weekend days and quiet days are sparse, like the real exports
+                quantities = [
+                    rng.randint(0, 60) if rng.random() > 0.15 else 0
+                    for _ in range(days)
+                ]
+                totals[(group, name)] = quantities
+            amounts = [round(q * price / 1.2, 2) for q in quantities]
+            sheet.append([name, price, "Broj"] + quantities + [sum(quantities)])
+            sheet.append([None, None, "Iznos"] + amounts + [round(sum(amounts), 2)])
+
+    grand_quantities = [sum(values) for values in zip(*(totals[(g, n)] for g in GROUPS[:2] for n, _ in services))]
+    sheet.append(["TOTAL", None, "Broj"] + grand_quantities + [sum(grand_quantities)])
+    sheet.append([None, None, "Iznos"] + [None] * days + [None])
+
+    book.save(path)
+
+def generate_reports(output_dir, providers=5, services=10, days=31, year=2025, month=5, code_base=7000, seed=42):
+    """Write providers x services x days synthetic reports and return their paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    days = min(days, calendar.monthrange(year, month)[1])
+    rng = random.Random(seed)
+    paths = []
+    for p in range(providers):
+        provider = f"Benchmark{p + 1:03d}_12"
+        provider_services = generate_services(provider, services, code_base + p * services, rng)
+        path = os.path.join(output_dir, report_filename(provider, 5000 + p, year, month, days))
+        write_report(path, provider, provider_services, year, month, days, rng)
+        paths.append(path)
+    logging.info(f"Generated {len(paths)} reports ({services} services x {days} days each) in {output_dir}")
+    return paths
+
+def main():
+    """Generate reports from command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate synthetic mParking MicropaymentMerchantReport workbooks")
+    parser.add_argument("--output-dir", default=os.path.join(os.getcwd(), "scripts/input/"))
+    parser.add_argument("--providers", type=int, default=5)
+    parser.add_argument("--services", type=int, default=10, help="services per provider")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=5)
+    parser.add_argument("--code-base", type=int, default=7000, help="first 4-digit service code to use")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.code_base + args.providers * args.services > 9999:
+        parser.error("service codes must stay 4-digit: lower --code-base, --providers or --services")
+
+    generate_reports(
+        args.output_dir,
+        providers=args.providers,
+        services=args.services,
+        days=args.days,
+        year=args.year,
+        month=args.month,
+        code_base=args.code_base,
+        seed=args.seed
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Re-ingest the archived mParking reports under public/parking-servis.
+
+move_file_to_service_directory files every imported report under
+public/parking-servis/<provider>/reports/<year>/. This script walks that tree
+and loads each report again, e.g. to rebuild ParkingTransaction after a
+schema change or a restore. Files are parsed in a process pool and loaded
+one report per transaction in file order; nothing is moved.
+
+Every finished file is appended to a JSON-lines checkpoint and fsynced, so
+an interrupted backfill started again with the same checkpoint continues
+after the last file that committed. --max-rows-per-second spaces the loads
+out so a backfill can run next to the regular import.
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import parking_service_processor as processor
+
+ARCHIVE_ROOT = os.path.join(processor.PROJECT_ROOT, "public", "parking-servis")
+CHECKPOINT_FILE = os.getenv(
+    "PARKING_BACKFILL_CHECKPOINT",
+    os.path.join(processor.PROJECT_ROOT, "scripts/data/backfill/checkpoint.jsonl")
+)
+MAX_ROWS_PER_SECOND = float(os.getenv("PARKING_BACKFILL_MAX_ROWS_PER_SECOND", "0"))
+REPORT_EXTENSIONS = (".xls", ".xlsx")
+
+def find_archived_reports(root):
+    """Report workbooks under root, in a stable provider/year/file order"""
+    reports = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        reports.extend(
+            os.path.join(directory, filename)
+            for filename in sorted(filenames)
+            if filename.lower().endswith(REPORT_EXTENSIONS)
+        )
+    return reports
+
+class Checkpoint:
+    """Append-only JSON-lines record of finished files; the last line for a path wins.
+
+    Each line is flushed and fsynced before the next file is loaded, so after
+    a crash the checkpoint holds every file whose load committed, plus at most
+    one committed file that is loaded again (the upserts are idempotent).
+    """
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.entries = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            self._read()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _read(self):
+        with open(self.path, encoding="utf-8") as fin:
+            for line in fin:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash; that file is simply processed again
+                    continue
+                self.entries[entry['path']] = entry
+        logging.info(f"Checkpoint {self.path}: {len(self.entries)} files already finished")
+
+    def finished(self, path, file_hash, retry_failed=False):
+        """True when path was loaded with this exact content (or failed, unless retry_failed)"""
+        entry = self.entries.get(path)
+        if not entry or entry['fileHash'] != file_hash:
+            return False
+        return entry['status'] != "failed" or not retry_failed
+
+    def record(self, path, file_hash, status, **fields):
+        entry = {'path': path, 'fileHash': file_hash, 'status': status, 'at': datetime.now().isoformat(), **fields}
+        self.file.write(json.dumps(entry, default=str) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries[path] = entry
+
+    def close(self):
+        self.file.close()
+
+class WriteThrottle:
+    """Keeps the average load rate under rows_per_second by pausing before the next load"""
+
+    def __init__(self, rows_per_second):
+        self.rows_per_second = rows_per_second
+        self.next_load = time.monotonic()
+        self.waited = 0.0
+
+    def wait(self, rows):
+        if not self.rows_per_second:
+            return
+        now = time.monotonic()
+        if self.next_load > now:
+            time.sleep(self.next_load - now)
+            self.waited += self.next_load - now
+            now = self.next_load
+        self.next_load = now + rows / self.rows_per_second
+
+def mark_service_completed(result, file_path):
+    """Point the provider's ParkingService at the archived report, as the import's file move does"""
+    conn = processor.get_db_connection()
+    try:
+        processor.update_parking_service_file_info(
+            conn,
+            result['parking_service_id'],
+            result['filename'],
+            file_path,
+            os.path.getsize(file_path),
+            "completed",
+            result['current_user_id']
+        )
+    finally:
+        processor.return_db_connection(conn)
+
+def backfill_report(context, checkpoint, throttle, key, file_path, file_hash, result, error):
+    """Load one parsed report and checkpoint the outcome; returns the number of rows loaded"""
+    if error is None and (not result or result['records'].empty):
+        error = "No records found"
+    if error is not None:
+        entry = processor.record_failed_file(context, file_path, file_hash, error)
+        processor.record_import_ledger([entry], "failed", context.user_id)
+        checkpoint.record(key, file_hash, "failed", error=str(error))
+        return 0
+
+    entry = processor.record_parsed_file(context, result, file_hash)
+    records = result['records']
+    throttle.wait(len(records))
+    started = time.perf_counter()
+    try:
+        counts = processor.load_report(entry, records)
+    except Exception as e:
+        logging.error(f"Load of {entry['filename']} rolled back: {e}")
+        context.count('files_failed')
+        checkpoint.record(key, file_hash, "failed", error=str(e))
+        return 0
+    processor.record_loaded_report(context, entry, records, counts, started)
+    mark_service_completed(result, file_path)
+    checkpoint.record(
+        key,
+        file_hash,
+        processor.ledger_status(counts),
+        rows=len(records),
+        **counts
+    )
+    return len(records)
+
+def run_backfill(context, reports, checkpoint, throttle, workers=1, retry_failed=False, log_every=50):
+    """Parse the reports in a pool and load them in order, skipping files the checkpoint has finished"""
+    root = context.args.root
+    pending = []
+    for file_path in reports:
+        key = os.path.relpath(file_path, root)
+        file_hash = processor.compute_file_hash(file_path)
+        if checkpoint.finished(key, file_hash, retry_failed):
+            context.count('files_skipped')
+            continue
+        pending.append((key, file_path, file_hash))
+    logging.info(f"Backfill: {len(reports)} reports, {len(reports) - len(pending)} already finished, {len(pending)} to load")
+
+    started = time.perf_counter()
+    rows = 0
+    done = 0
+    with processor.make_parse_executor(workers) as executor:
+        # Keep every worker busy with one file queued behind it, while loads stay in file order
+        in_flight = collections.deque()
+        queue = iter(pending)
+        try:
+            while True:
+                while len(in_flight) < 2 * workers:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    key, file_path, file_hash = item
+                    in_flight.append((item, executor.submit(processor.process_excel, file_path, file_hash)))
+                if not in_flight:
+                    break
+                (key, file_path, file_hash), future = in_flight.popleft()
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                rows += backfill_report(context, checkpoint, throttle, key, file_path, file_hash, result, error)
+                done += 1
+                if done % log_every == 0 or done == len(pending):
+                    elapsed = time.perf_counter() - started
+                    remaining = (len(pending) - done) * elapsed / done
+                    logging.info(
+                        f"Backfill progress: {done}/{len(pending)} files, {rows} rows, "
+                        f"{rows / elapsed:.0f} rows/s, throttled {throttle.waited:.1f}s, ~{remaining / 60:.1f} min left"
+                    )
+        except KeyboardInterrupt:
+            for _, future in in_flight:
+                future.cancel()
+            logging.warning(f"Backfill interrupted after {done} files; run it again with the same checkpoint to resume")
+            raise
+    return context.counters
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Re-ingest archived mParking reports with checkpoints")
+    parser.add_argument("user_id", nargs="?", help="ID of the user recorded on the import (default: system user)")
+    parser.add_argument(
+        "--root", default=ARCHIVE_ROOT,
+        help="archive tree to walk (default: public/parking-servis)"
+    )
+    parser.add_argument(
+        "--checkpoint", default=CHECKPOINT_FILE,
+        help="JSON-lines checkpoint of finished files (default: $PARKING_BACKFILL_CHECKPOINT or "
+             "scripts/data/backfill/checkpoint.jsonl)"
+    )
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and load every report again")
+    parser.add_argument("--retry-failed", action="store_true", help="load files the checkpoint marks failed again")
+    parser.add_argument(
+        "--workers", type=int, default=1, metavar="N",
+        help="parse workbooks in N worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--max-rows-per-second", type=float, default=MAX_ROWS_PER_SECOND, metavar="N",
+        help="average database write rate limit, 0 for none (default: $PARKING_BACKFILL_MAX_ROWS_PER_SECOND or 0)"
+    )
+    parser.add_argument(
+        "--atomic", action="store_true", default=processor.ATOMIC_LOAD,
+        help="load with savepoint-guarded chunks and reject files, as the importer's --atomic (default: $PARKING_ATOMIC_LOAD)"
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, metavar="N", default=processor.ATOMIC_CHUNK_ROWS,
+        help="rows per savepoint chunk with --atomic (default: $PARKING_ATOMIC_CHUNK_ROWS or 5000)"
+    )
+    parser.add_argument(
+        "--delta", action="store_true", default=processor.DELTA_LOAD,
+        help="only write new and changed rows (default: $PARKING_DELTA_LOAD)"
+    )
+    parser.add_argument(
+        "--parse-cache", action="store_true",
+        help="read and fill the parse cache; off by default since every archived report is parsed once"
+    )
+    parser.add_argument("--log-every", type=int, default=50, metavar="N", help="log progress every N files (default: 50)")
+    args = parser.parse_args()
+    # The atomic loader upserts every row; it never runs the delta path. There is no --delete-missing
+    # flag here, but import_to_postgresql still picks up $PARKING_DELETE_MISSING
+    if args.atomic and (args.delta or processor.DELETE_MISSING):
+        parser.error("--atomic cannot be combined with --delta/$PARKING_DELETE_MISSING (check $PARKING_ATOMIC_LOAD/$PARKING_DELTA_LOAD)")
+    return args
+
+def main():
+    """Walk the archive and load every report not yet in the checkpoint"""
+    processor.configure_logging()
+    args = parse_args()
+    args.root = os.path.abspath(args.root)
+    processor.cli_args = args
+
+    reports = find_archived_reports(args.root)
+    if not reports:
+        logging.info(f"No reports found under {args.root}")
+        return
+    if not processor.test_database_connection():
+        logging.error("Database connection failed. Exiting.")
+        sys.exit(1)
+
+    context = processor.init_run_context(args)
+    context.count('files_found', len(reports))
+    checkpoint = Checkpoint(args.checkpoint, args.restart)
+    try:
+        run_backfill(
+            context,
+            reports,
+            checkpoint,
+            WriteThrottle(args.max_rows_per_second),
+            args.workers,
+            args.retry_failed,
+            args.log_every
+        )
+        logging.info(f"Backfill summary: {context.summary()}")
+    finally:
+        checkpoint.close()
+        context.audit.flush()
+        processor.close_db_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Column-level normalization for parsed mParking records.
+
+Whole-Series equivalents of the per-value helpers in parking_service_processor
+(extract_service_code, convert_date_format, convert_to_float, clean_date).
+Every column is factorized first, so each distinct service name, date header
+or cell text is normalized once; the distinct values then go through
+compiled regexes and pandas string ops instead of a Python call per row.
+
+Run `python scripts/parking_normalize.py [REPORT ...]` to check the column
+functions against the per-value helpers on edge cases and on real reports.
+"""
+import argparse
+import logging
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+SERVICE_CODE_PATTERN = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+NON_DATE_CHARS = re.compile(r'[^0-9.]')
+WHITESPACE = re.compile(r'\s+')
+
+def _factorize(series):
+    """(codes, distinct values as an object Series) with missing values kept as their own entry"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return codes, pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+
+def _expand(codes, mapped, index):
+    """Broadcast per-distinct-value results back to the rows"""
+    return pd.Series(np.asarray(mapped, dtype=object)[codes], index=index, dtype=object)
+
+def _as_text(uniques):
+    """str() of each distinct value, as a plain object Series"""
+    return pd.Series([value if isinstance(value, str) else str(value) for value in uniques], dtype=object)
+
+def service_code_values(uniques):
+    """extract_service_code for distinct values: the first standalone 4-digit run, else None"""
+    present = np.array([bool(value) for value in uniques], dtype=bool)
+    text = _as_text(uniques)
+    found = text.str.extract(SERVICE_CODE_PATTERN, expand=False)
+    missing = present & found.isna().to_numpy()
+    for value in text[missing]:
+        logging.warning(f"No valid 4-digit code found in: {value}")
+    return np.where(present & ~missing, found.to_numpy(dtype=object), None)
+
+def service_code_column(series, as_text=False):
+    """series.map(extract_service_code); with as_text, series.astype(str).map(extract_service_code)"""
+    codes, uniques = _factorize(series)
+    if as_text:
+        uniques = _as_text(uniques)
+    return _expand(codes, service_code_values(uniques), series.index)
+
+def iso_date_values(uniques):
+    """convert_date_format for distinct values: 'D.M.YYYY'-like text to 'YYYY-MM-DD', else None"""
+    result = np.full(len(uniques), None, dtype=object)
+    present = np.array([bool(value) for value in uniques], dtype=bool)
+    if not present.any():
+        return result
+    text = _as_text(uniques[present])
+    # str.isdigit() also accepts non-ASCII digits, which [0-9] does not; leave those to the scalar rule
+    ascii_only = text.str.isascii().to_numpy()
+    cleaned = text.copy()
+    cleaned[ascii_only] = text[ascii_only].str.replace(NON_DATE_CHARS, '', regex=True)
+    cleaned[~ascii_only] = [''.join(c for c in value if c.isdigit() or c == '.') for value in text[~ascii_only]]
+
+    converted = np.full(len(text), None, dtype=object)
+    valid = (cleaned.str.count(r'\.') == 2).to_numpy()
+    if valid.any():
+        parts = cleaned[valid].str.split('.', expand=True)
+        day, month, year = parts[0], parts[1], parts[2]
+        year = year.where(year.str.len() != 2, '20' + year)
+        converted[valid] = (year + '-' + month.str.zfill(2) + '-' + day.str.zfill(2)).to_numpy(dtype=object)
+    result[present] = converted
+    return result
+
+def iso_date_column(series):
+    """series.fillna('').map(convert_date_format)"""
+    codes, uniques = _factorize(series)
+    uniques = uniques.where(uniques.notna(), '')
+    return _expand(codes, iso_date_values(uniques), series.index)
+
+def clean_date_values(values):
+    """clean_date for header cells: strings lose whitespace and trailing dots, other values pass through"""
+    return [
+        WHITESPACE.sub(' ', value.strip()).replace(' ', '').rstrip('.') if isinstance(value, str) else value
+        for value in values
+    ]
+
+def _to_float(value):
+    """convert_to_float for one value, NaN instead of None"""
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def float_column(series):
+    """Column equivalent of convert_to_float(...) or 0, with missing values as 0"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float).fillna(0)
+    codes, uniques = _factorize(series)
+    mapped = np.array([_to_float(value) for value in uniques], dtype=float)
+    return pd.Series(mapped[codes], index=series.index).fillna(0)
+
+EDGE_CASES = [
+    "", " ", None, np.nan, 0, 0.0, 7181, 7181.0, 12345, True,
+    "S___7181AleksinacZona1", "S_9320__9320_Cacak", "12345", "1234", "a1234b", "x12345 6789",
+    "01.05.\n2025.", "1.5.25", "31.12.2024", "2025-05-01", "01.05", "1..2025", "..", "01.05.2025.",
+    " 1 . 5 . 2025 ", "٠١.٠٥.٢٠٢٥", "¹.².2025", "nan", "None",
+    "1,234.5", " 70 ", "1e3", "inf", "-0", "abc", "1_000", "12,5",
+]
+
+def _same(left, right):
+    """Element-wise equality treating None/NaN pairs as equal"""
+    if len(left) != len(right):
+        return False
+    for a, b in zip(left, right):
+        if a is None and b is None:
+            continue
+        if isinstance(a, float) and isinstance(b, float) and np.isnan(a) and np.isnan(b):
+            continue
+        if type(a) is not type(b) and not (isinstance(a, (int, float)) and isinstance(b, (int, float))):
+            return False
+        if a != b:
+            return False
+    return True
+
+def verify(paths):
+    """Compare the column functions with the per-value helpers; return True when all match"""
+    import parking_service_processor as processor
+
+    samples = list(EDGE_CASES)
+    for path in paths:
+        try:
+            sheet = processor.read_report_sheet(path)
+        except Exception as e:
+            logging.error(f"Skipping {path}: {e}")
+            continue
+        if sheet is None:
+            continue
+        for row in processor.iter_sheet_rows(path, sheet.sheet_index):
+            samples.extend(row)
+        records, _ = processor.parse_report_frame(sheet)
+        samples.extend(records['serviceName'].tolist())
+    series = pd.Series(samples, dtype=object)
+
+    checks = {
+        'extract_service_code': (
+            service_code_column(series).tolist(),
+            [processor.extract_service_code(value) for value in samples]
+        ),
+        'extract_service_code(str)': (
+            service_code_column(series, as_text=True).tolist(),
+            [processor.extract_service_code(str(value)) for value in samples]
+        ),
+        'convert_date_format': (
+            iso_date_column(series).tolist(),
+            [processor.convert_date_format(value) for value in series.fillna('')]
+        ),
+        'convert_to_float': (
+            float_column(series).tolist(),
+            pd.Series([processor.convert_to_float(value) for value in samples], dtype=float).fillna(0).tolist()
+        ),
+        'clean_date': (
+            clean_date_values(samples),
+            [processor.clean_date(value) for value in samples]
+        ),
+    }
+
+    ok = True
+    for name, (column, reference) in checks.items():
+        if _same(column, reference):
+            logging.info(f"OK {name}: {len(reference)} values")
+            continue
+        ok = False
+        mismatches = [(value, a, b) for value, a, b in zip(samples, column, reference) if not _same([a], [b])]
+        logging.error(f"MISMATCH {name}: {len(mismatches)} values, e.g. {mismatches[:5]}")
+    return ok
+
+def benchmark(rows):
+    """Time sanitize_parking_frame against the per-record sanitize_parking_record on a synthetic batch"""
+    import parking_service_processor as processor
+
+    index = np.arange(rows)
+    df = pd.DataFrame({
+        'parkingServiceId': 'ps',
+        'serviceId': 'sv',
+        'group': np.where(index % 7 == 0, 'postpaid', 'prepaid'),
+        'serviceName': [f"S_{7000 + i % 400}__{7000 + i % 400}_Zona" for i in index],
+        'price': 70.0,
+        'date': [f"{1 + i % 31:02d}.05.2025" for i in index],
+        'quantity': (index % 13).astype(float),
+        'amount': (index % 13) * 58.33
+    })
+    started = time.perf_counter()
+    processor.sanitize_parking_frame(df)
+    column_seconds = time.perf_counter() - started
+
+    sample = df.head(min(rows, 10000)).to_dict('records')
+    started = time.perf_counter()
+    for row in sample:
+        processor.sanitize_parking_record(row)
+    per_row_seconds = (time.perf_counter() - started) * rows / len(sample)
+    logging.info(f"{rows} rows: column normalization {column_seconds * 1000:.1f} ms, per-record helpers ~{per_row_seconds * 1000:.0f} ms")
+
+def main():
+    """Verify the column functions against the per-value helpers"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stdout
+    )
+    parser = argparse.ArgumentParser(description="Check parking_normalize against the per-value helpers")
+    parser.add_argument("reports", nargs="*", help="report workbooks whose cells are added to the checked values")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="also time a synthetic batch of ROWS records")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    ok = verify(args.reports)
+    logging.getLogger().setLevel(logging.INFO)
+    logging.info("All column functions match" if ok else "Column functions differ from the per-value helpers")
+    if args.benchmark:
+        benchmark(args.benchmark)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
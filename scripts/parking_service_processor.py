@@ -1,34 +1,179 @@
-import uuid
-import pandas as pd
+import time
+# Taken before anything else is imported so --startup-profile can report module import time
+MODULE_IMPORT_STARTED = time.perf_counter()
+import importlib
+import importlib.util
+import contextlib
+import cProfile
 import csv
 import glob
+import hashlib
+import io
 import os
 import re
 import logging
-import psycopg2
-# FIX 1: Import the pool module correctly
-from psycopg2 import pool
-import shutil
 import sys
+import threading
+import tracemalloc
+import weakref
+import argparse
+import atexit
+import collections
+import json
+import multiprocessing
+import signal
+import socketserver
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
-sys.stdout.reconfigure(encoding='utf-8')
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    stream=sys.stdout
-)
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    pandas, numpy and psycopg2 dominate start-up time; deferring them keeps
+    --help and argument errors instant and lets main() import them on a
+    background thread while the database connection is being opened.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+uuid = LazyModule("uuid")
+shutil = LazyModule("shutil")
+asyncio = LazyModule("asyncio")
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+psycopg2 = LazyModule("psycopg2")
+# FIX 1: Import the pool module correctly
+pool = LazyModule("psycopg2.pool")
+extras = LazyModule("psycopg2.extras")
+# Column-level normalization (scripts/parking_normalize.py); imports numpy and pandas itself
+normalize = LazyModule("parking_normalize")
+HEAVY_MODULES = [np, pd, psycopg2, pool, extras, normalize]
+
+def configure_logging(stream=None):
+    """UTF-8 stdout and the log format; called from main() and pool workers, not at import"""
+    sys.stdout.reconfigure(encoding='utf-8')
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=stream or sys.stdout
+    )
+
 connection_pool = None
+cli_args = None
+run_context = None
+
+class ConnectionPoolManager:
+    """Thread-safe psycopg2 pool with liveness checks, reconnects and prepared statements.
+
+    Checkout goes through a ThreadedConnectionPool. A connection that sat idle
+    longer than check_after seconds is pinged before it is handed out and
+    replaced if the ping fails; closed or broken connections are dropped on
+    return. Note that psycopg2 closes returned connections beyond minconn
+    instead of keeping them idle.
+
+    execute() runs hot-path statements as named server-side prepared
+    statements, prepared once per connection. Behind a transaction pooler
+    (pooler_safe) consecutive transactions may land on different server
+    sessions, so session state such as prepared statements cannot be relied
+    on and execute() falls back to plain statements.
+    """
+
+    def __init__(self, db_params, minconn=1, maxconn=20, pooler_safe=False, check_after=30.0):
+        self.pool = pool.ThreadedConnectionPool(minconn, maxconn, **db_params)
+        self.maxconn = maxconn
+        self.pooler_safe = pooler_safe
+        self.check_after = check_after
+        self.lock = threading.Lock()
+        self.returned_at = weakref.WeakKeyDictionary()  # connection -> monotonic time it was returned
+        self.prepared = weakref.WeakKeyDictionary()     # connection -> names prepared in its session
+        self.reconnects = 0
+
+    def _alive(self, conn):
+        if conn.closed:
+            return False
+        with self.lock:
+            returned_at = self.returned_at.get(conn)
+        if returned_at is None or time.monotonic() - returned_at < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        # Every pooled connection can be dead after a server restart or pooler timeout
+        for _ in range(self.maxconn + 1):
+            conn = self.pool.getconn()
+            if self._alive(conn):
+                return conn
+            logging.warning("Dropping dead database connection and reconnecting")
+            self.reconnects += 1
+            self.pool.putconn(conn, close=True)
+        return self.pool.getconn()
+
+    def putconn(self, conn):
+        broken = conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+        if not broken:
+            with self.lock:
+                self.returned_at[conn] = time.monotonic()
+        self.pool.putconn(conn, close=broken)
+
+    def closeall(self):
+        self.pool.closeall()
+
+    def execute(self, cur, name, sql, params):
+        """cur.execute(sql, params), as EXECUTE of a statement prepared once per connection"""
+        if self.pooler_safe:
+            cur.execute(sql, params)
+            return
+        conn = cur.connection
+        with self.lock:
+            names = self.prepared.setdefault(conn, set())
+        if name not in names:
+            # PREPARE is not undone by a rollback, so the name stays valid for the session
+            cur.execute(f"PREPARE {name} AS {positional_parameters(sql)}")
+            names.add(name)
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
 
-def init_db_pool():
+def positional_parameters(sql):
+    """Turn psycopg2 %s placeholders into the $1, $2, ... that PREPARE expects"""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda match: f"${next(counter)}", sql).replace("%%", "%")
+
+def pooler_safe_mode(db_params):
+    """Whether to avoid session state: explicitly configured, or auto-detected from the pooler port"""
+    if DB_POOLER_MODE == "auto":
+        return str(db_params.get("port")) == SUPABASE_POOLER_PORT
+    return DB_POOLER_MODE == "transaction"
+
+def init_db_pool(minconn=None, maxconn=None):
     global connection_pool
     db_params = get_db_params()
-    # FIX 1: Use SimpleConnectionPool correctly
-    connection_pool = pool.SimpleConnectionPool(
-        1, 20, **db_params
+    minconn = DB_POOL_MIN if minconn is None else minconn
+    maxconn = DB_POOL_MAX if maxconn is None else maxconn
+    pooler_safe = pooler_safe_mode(db_params)
+    connection_pool = ConnectionPoolManager(
+        db_params, minconn, maxconn, pooler_safe=pooler_safe, check_after=DB_CHECK_AFTER
+    )
+    logging.info(
+        f"Database connection pool initialized ({minconn}-{maxconn} connections, "
+        f"{'transaction pooler, no prepared statements' if pooler_safe else 'prepared statements'})"
     )
-    logging.info("Database connection pool initialized")
 
 def get_db_connection():
     global connection_pool
@@ -40,6 +185,29 @@ def return_db_connection(conn):
     global connection_pool
     connection_pool.putconn(conn)
 
+def execute_prepared(cur, name, sql, params):
+    """Execute a statement that runs over and over as a named prepared statement on the run's pool"""
+    if connection_pool:
+        connection_pool.execute(cur, name, sql, params)
+    else:
+        cur.execute(sql, params)
+
+def close_db_pool():
+    global connection_pool
+    if connection_pool:
+        connection_pool.closeall()
+        connection_pool = None
+        logging.info("Database connection pool closed")
+
+def lock_dimension(cur, kind, key):
+    """Serialize get-or-create of one dimension row across concurrent workers.
+
+    The lock is transaction scoped, so callers must commit or roll back once
+    the lookup/insert is done to release it. (Session-level advisory locks
+    would not survive a transaction pooler.)
+    """
+    execute_prepared(cur, "lock_dimension", "SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{kind}:{key}",))
+
 def get_db_params():
     """Get database parameters based on environment configuration"""
     # Check if we should use local database
@@ -67,6 +235,15 @@ def get_db_params():
         "password": password,
     }
 
+# Connection pool sizing; idle connections are pinged after DB_CHECK_AFTER seconds.
+# PARKING_DB_POOLER_MODE: "transaction" (PgBouncer/Supavisor transaction pooling: no
+# prepared statements or other session state), "session", or "auto" = transaction on 6543
+DB_POOL_MIN = int(os.getenv("PARKING_DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("PARKING_DB_POOL_MAX", "20"))
+DB_CHECK_AFTER = float(os.getenv("PARKING_DB_CHECK_AFTER", "30"))
+DB_POOLER_MODE = os.getenv("PARKING_DB_POOLER_MODE", "auto").lower()
+SUPABASE_POOLER_PORT = "6543"
+
 # GitHub Codespace folder paths
 PROJECT_ROOT = os.getcwd()
 FOLDER_PATH = os.path.join(PROJECT_ROOT, "scripts/input/")
@@ -74,12 +251,69 @@ PROCESSED_FOLDER = os.path.join(PROJECT_ROOT, "scripts/processed/")
 ERROR_FOLDER = os.path.join(PROJECT_ROOT, "scripts/errors/")
 OUTPUT_FILE = os.path.join(PROJECT_ROOT, "scripts/data/parking_output.csv")
 
-# Create folders if they don't exist
-os.makedirs(FOLDER_PATH, exist_ok=True)
-os.makedirs(PROCESSED_FOLDER, exist_ok=True)
-os.makedirs(ERROR_FOLDER, exist_ok=True)
-os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+# Workbooks open with summary sheets named like these; the first other sheet holds the
+# per-service daily report. GROUP_KEYWORDS are the row markers that switch groups
+SUMMARY_SHEET_PREFIXES = ("SDP_mParking", "VAS ")
+GROUP_KEYWORDS = ["prepaid", "postpaid", "total"]
+
+# Load ParkingTransaction rows with COPY + one set-based upsert instead of one INSERT per row
+BULK_LOAD = os.getenv("PARKING_BULK_LOAD", "true").lower() == "true"
+
+# Delta load: only insert new keys and update rows whose values changed; optionally
+# delete rows that vanished from the re-imported reports' date range
+DELTA_LOAD = os.getenv("PARKING_DELTA_LOAD", "false").lower() == "true"
+DELETE_MISSING = os.getenv("PARKING_DELETE_MISSING", "false").lower() == "true"
+
+# Atomic load: one transaction and one commit per report file. Rows are upserted in
+# savepoint-guarded chunks; a failing chunk is bisected down to the rows that fail,
+# which go to a CSV in REJECT_DIR instead of taking the rest of the file with them
+ATOMIC_LOAD = os.getenv("PARKING_ATOMIC_LOAD", "false").lower() == "true"
+ATOMIC_CHUNK_ROWS = int(os.getenv("PARKING_ATOMIC_CHUNK_ROWS", "5000"))
+REJECT_DIR = os.getenv("PARKING_REJECT_DIR", os.path.join(PROJECT_ROOT, "scripts/data/rejects/"))
+
+# Pipelined run: parsing, loading and archiving overlap, joined by queues of at most
+# PIPELINE_QUEUE_SIZE parsed reports; each report is loaded in its own transaction
+PIPELINE = os.getenv("PARKING_PIPELINE", "false").lower() == "true"
+PIPELINE_QUEUE_SIZE = int(os.getenv("PARKING_PIPELINE_QUEUE", "4"))
+
+# Streamed run: each report is loaded in its own transaction as soon as it is parsed and
+# then dropped, so memory stays flat however many files are waiting in the input folder
+STREAM_LOAD = os.getenv("PARKING_STREAM", "false").lower() == "true"
+
+# ParkingMonthlyRollup holds quantity/amount totals per parking service, service and month;
+# every load recomputes the months it touched inside its own transaction
+MONTHLY_ROLLUPS = os.getenv("PARKING_MONTHLY_ROLLUPS", "true").lower() == "true"
 
+# ActivityLog events are buffered and written in batches of this size or age
+AUDIT_FLUSH_EVENTS = int(os.getenv("PARKING_AUDIT_FLUSH_EVENTS", "100"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("PARKING_AUDIT_FLUSH_SECONDS", "5"))
+
+# Also write the parsed records to OUTPUT_FILE (the importer no longer reads it back)
+EXPORT_CSV = os.getenv("PARKING_EXPORT_CSV", "false").lower() == "true"
+
+# Normalized records can also be written to a Parquet dataset partitioned by provider and month;
+# "replace" swaps out every partition the run touched, "append" adds a new part file to it
+EXPORT_PARQUET = os.getenv("PARKING_EXPORT_PARQUET", "false").lower() == "true"
+EXPORT_DIR = os.getenv("PARKING_EXPORT_DIR", os.path.join(PROJECT_ROOT, "scripts/data/parking_dataset/"))
+EXPORT_MODE = os.getenv("PARKING_EXPORT_MODE", "replace")
+
+# Parsed reports are cached as Parquet keyed by file hash; bump PARSER_VERSION whenever
+# read_report_sheet/parse_report_frame output changes so stale entries are never read
+PARSER_VERSION = "1"
+PARSE_CACHE = os.getenv("PARKING_PARSE_CACHE", "true").lower() == "true"
+PARSE_CACHE_DIR = os.getenv("PARKING_PARSE_CACHE_DIR", os.path.join(PROJECT_ROOT, "scripts/data/parse_cache/"))
+PARSE_CACHE_MAX_MB = float(os.getenv("PARKING_PARSE_CACHE_MAX_MB", "256"))
+
+# Opt-in instrumentation: per-stage timers + tracemalloc, and per-file cProfile dumps
+PROFILE = os.getenv("PARKING_PROFILE", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PARKING_PROFILE_DIR")
+
+def ensure_folders():
+    """Create the working folders if they don't exist"""
+    os.makedirs(FOLDER_PATH, exist_ok=True)
+    os.makedirs(PROCESSED_FOLDER, exist_ok=True)
+    os.makedirs(ERROR_FOLDER, exist_ok=True)
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
 
 def extract_service_code(service_name):
     """Extract first four digits from serviceName - matches exact 4-digit codes"""
@@ -98,17 +332,16 @@ def extract_service_code(service_name):
         return None
 
 def test_database_connection():
-    """Test connection to Supabase database"""
+    """Test the database through the pool's first connection, which the run then reuses"""
+    conn = None
     try:
         logging.info("Testing database connection...")
-        db_params = get_db_params()
-        conn = psycopg2.connect(**db_params)
+        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute("SELECT version();")
         version = cur.fetchone()
         logging.info(f"Connected to: {version[0]}")
         cur.close()
-        conn.close()
         return True
     except ValueError as e:
         logging.error(f"Configuration error: {e}")
@@ -116,11 +349,17 @@ def test_database_connection():
     except Exception as e:
         logging.error(f"Database connection failed: {e}")
         return False
+    finally:
+        if conn:
+            return_db_connection(conn)
 
 def get_current_user():
-    """Get user ID from command line arguments or system"""
-    if len(sys.argv) > 1:
-        user_id = sys.argv[1]
+    """Get user ID from the run context, command line arguments or system"""
+    if run_context:
+        return run_context.user_id
+    
+    user_id = cli_args.user_id if cli_args else (sys.argv[1] if len(sys.argv) > 1 else None)
+    if user_id:
         logging.info(f"Using authenticated user ID: {user_id}")
         return user_id
     
@@ -129,9 +368,9 @@ def get_current_user():
 
 def get_or_create_system_user():
     """Get or create system user for logging purposes"""
+    conn = None
     try:
-        db_params = get_db_params()
-        conn = psycopg2.connect(**db_params)
+        conn = get_db_connection()
         cur = conn.cursor()
         
         cur.execute('SELECT "id" FROM "User" WHERE "email" = %s', ('system@internal.app',))
@@ -140,8 +379,8 @@ def get_or_create_system_user():
         if result:
             user_id = result[0]
             logging.debug(f"Found existing system user: {user_id}")
+            conn.commit()
             cur.close()
-            conn.close()
             return user_id
         
         cur.execute('''
@@ -154,18 +393,105 @@ def get_or_create_system_user():
         conn.commit()
         logging.info(f"Created system user: {user_id}")
         cur.close()
-        conn.close()
         return user_id
         
     except Exception as e:
         logging.error(f"Error getting/creating system user: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
         return None
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+ACTIVITY_LOG_INSERT_SQL = """
+INSERT INTO "ActivityLog" (
+    "id", "action", "entityType", "entityId", "details", 
+    "severity", "userId", "createdAt"
+) VALUES %s
+"""
+
+class AuditLogWriter:
+    """Queue ActivityLog events in memory and write them with multi-row inserts.
+
+    Events are flushed when the queue reaches max_events, when the oldest
+    queued event is older than max_age seconds, and explicitly at run end.
+    Flushes use their own pooled connection, so audit writes never commit
+    in the middle of a pipeline transaction.
+    """
+
+    def __init__(self, max_events=100, max_age=5.0):
+        self.max_events = max_events
+        self.max_age = max_age
+        self.events = []
+        self.oldest = None
+        self.lock = threading.Lock()
+
+    def add(self, event):
+        with self.lock:
+            if not self.events:
+                self.oldest = time.monotonic()
+            self.events.append(event)
+            due = len(self.events) >= self.max_events or time.monotonic() - self.oldest >= self.max_age
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return 0
+
+        conn = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            extras.execute_values(cur, ACTIVITY_LOG_INSERT_SQL, events, page_size=len(events))
+            conn.commit()
+            cur.close()
+            logging.info(f"ActivityLog flushed: {len(events)} entries")
+            return len(events)
+        except Exception as e:
+            logging.error(f"Failed to flush {len(events)} ActivityLog entries: {e}")
+            try:
+                conn.rollback()
+            except:
+                pass
+            return 0
+        finally:
+            if conn:
+                return_db_connection(conn)
+
+class ProgressReporter:
+    """Machine-readable progress events, one JSON object per line.
+
+    Every event carries elapsedMs since the reporter was created; stage events
+    add their own duration in ms. With no sink the reporter does nothing.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        if not self.sink:
+            return
+        payload = {'event': event, 'elapsedMs': round((time.perf_counter() - self.started) * 1000, 1), **fields}
+        with self.lock:
+            self.sink(payload)
+
+def write_json_line(payload, stream=None):
+    """Write one event to stdout (or stream) as a single flushed JSON line"""
+    stream = stream or sys.stdout
+    stream.write(json.dumps(payload, default=str) + "\n")
+    stream.flush()
 
 def log_to_database(conn, entity_type, entity_id, action, subject, description=None, severity='INFO', user_id=None):
-    """Log actions to the ActivityLog table"""
+    """Log actions to the ActivityLog table, through the run's buffered writer when there is one"""
     try:
-        cur = conn.cursor()
-        
         if not user_id:
             user_id = get_current_user()
             if not user_id:
@@ -177,7 +503,14 @@ def log_to_database(conn, entity_type, entity_id, action, subject, description=N
             details += f": {description}"
         
         log_id = str(uuid.uuid4())
+        now = datetime.now()
+        
+        if run_context and run_context.audit:
+            run_context.audit.add((log_id, action, entity_type, entity_id, details, severity, user_id, now))
+            logging.debug(f"ActivityLog queued: {log_id} - {action} - {entity_type}")
+            return log_id
         
+        cur = conn.cursor()
         log_sql = """
         INSERT INTO "ActivityLog" (
             "id", "action", "entityType", "entityId", "details", 
@@ -185,7 +518,6 @@ def log_to_database(conn, entity_type, entity_id, action, subject, description=N
         ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
         
-        now = datetime.now()
         cur.execute(log_sql, (
             log_id,
             action,
@@ -209,208 +541,522 @@ def log_to_database(conn, entity_type, entity_id, action, subject, description=N
             pass
         return None
 
-def get_or_create_service(conn, service_code, service_type='PARKING', billing_type='PREPAID'):
-    """Find or create Service based on extracted 4-digit code"""
-    try:
+class DimensionResolver:
+    """Resolve ParkingService, Service, Contract and ServiceContract ids with set-based queries.
+
+    Known keys are cached for the lifetime of the resolver, so a run (or a
+    long-lived process) only asks the database about keys it has not seen.
+    Missing rows are created with one multi-row INSERT per table.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.parking_services = {}   # provider name -> ParkingService id
+        self.services = {}           # service code -> Service id
+        self.contracts = {}          # ParkingService id -> active PARKING Contract id
+        self.service_contracts = {}  # (Contract id, Service id) -> ServiceContract id
+        self.loaded = False
+
+    def invalidate(self):
+        """Drop all cached keys"""
+        self.parking_services.clear()
+        self.services.clear()
+        self.contracts.clear()
+        self.service_contracts.clear()
+        self.loaded = False
+
+    def preload(self, conn):
+        """Load the existing parking dimension keys in a few set-based queries"""
         cur = conn.cursor()
-        created = False
-        
-        cur.execute('SELECT "id" FROM "Service" WHERE "name" = %s', (service_code,))
-        result = cur.fetchone()
-        
-        if result:
-            service_id = result[0]
-            logging.info(f"Found existing service: {service_code} (ID: {service_id})")
-            cur.close()
-            return service_id, created
-        
-        created = True
-        cur.execute('''
-            INSERT INTO "Service" ("id", "name", "type", "billingType", "description", "isActive", "createdAt", "updatedAt")
-            VALUES (gen_random_uuid(), %s, %s, %s, %s, true, %s, %s)
-            RETURNING "id"
-        ''', (service_code, service_type, billing_type, f'Auto-created parking service: {service_code}', datetime.now(), datetime.now()))
-        
-        service_id = cur.fetchone()[0]
-        conn.commit()
-        logging.info(f"Created new service: {service_code} (ID: {service_id})")
-        cur.close()
-        
-        return service_id, created
-        
-    except Exception as e:
-        logging.error(f"Error getting/creating service {service_code}: {e}")
         try:
-            conn.rollback()
-        except:
-            pass
-        return None, False
+            cur.execute('''
+                SELECT DISTINCT ON ("name") "name", "id" FROM "ParkingService"
+                ORDER BY "name", "createdAt"
+            ''')
+            self.parking_services.update(dict(cur.fetchall()))
 
-def get_or_create_parking_service(conn, provider_name):
-    """Find or create ParkingService based on provider name"""
-    try:
+            cur.execute('''
+                SELECT DISTINCT ON ("name") "name", "id" FROM "Service"
+                WHERE "type" = 'PARKING'
+                ORDER BY "name", "createdAt"
+            ''')
+            self.services.update(dict(cur.fetchall()))
+
+            cur.execute('''
+                SELECT DISTINCT ON ("parkingServiceId") "parkingServiceId", "id" FROM "Contract"
+                WHERE "type" = 'PARKING' AND "status" = 'ACTIVE' AND "parkingServiceId" IS NOT NULL
+                ORDER BY "parkingServiceId", "createdAt"
+            ''')
+            self.contracts.update(dict(cur.fetchall()))
+
+            cur.execute('''
+                SELECT sc."contractId", sc."serviceId", sc."id" FROM "ServiceContract" sc
+                JOIN "Contract" c ON c."id" = sc."contractId"
+                WHERE c."type" = 'PARKING' AND c."status" = 'ACTIVE'
+            ''')
+            self.service_contracts.update({(row[0], row[1]): row[2] for row in cur.fetchall()})
+            conn.commit()
+            self.loaded = True
+            logging.info(
+                f"Preloaded dimensions: {len(self.parking_services)} parking services, "
+                f"{len(self.services)} services, {len(self.contracts)} contracts, "
+                f"{len(self.service_contracts)} service contracts"
+            )
+        finally:
+            cur.close()
+
+    def resolve(self, conn, provider_name, service_codes):
+        """Get or create every dimension row a report needs, in one transaction.
+
+        Returns a dict with the parking service id, a service code -> Service id
+        mapping and the rows that were created, for activity logging.
+        """
+        if not self.loaded:
+            self.preload(conn)
+
+        service_codes = sorted(code for code in service_codes if code)
+        created = {'parking_service': False, 'services': [], 'service_contracts': []}
         cur = conn.cursor()
-        created = False
-        
-        cur.execute('SELECT "id" FROM "ParkingService" WHERE "name" = %s', (provider_name,))
+        try:
+            parking_service_id = self.parking_services.get(provider_name)
+            if not parking_service_id:
+                parking_service_id, created['parking_service'] = self._resolve_parking_service(cur, provider_name)
+
+            missing_codes = [code for code in service_codes if code not in self.services]
+            if missing_codes:
+                created['services'] = self._resolve_services(cur, missing_codes)
+
+            contract_id = self.contracts.get(parking_service_id)
+            if not contract_id:
+                contract_id = self._resolve_contract(cur, parking_service_id)
+
+            service_ids = {code: self.services[code] for code in service_codes if code in self.services}
+            missing_links = [
+                (code, service_id) for code, service_id in service_ids.items()
+                if (contract_id, service_id) not in self.service_contracts
+            ]
+            if missing_links:
+                created['service_contracts'] = self._resolve_service_contracts(cur, contract_id, missing_links)
+
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except:
+                pass
+            raise
+        finally:
+            cur.close()
+
+        return {
+            'parking_service_id': parking_service_id,
+            'service_ids': service_ids,
+            'created': created
+        }
+
+    def _resolve_parking_service(self, cur, provider_name):
+        lock_dimension(cur, "ParkingService", provider_name)
+        execute_prepared(cur, "select_parking_service", '''
+            SELECT "id" FROM "ParkingService" WHERE "name" = %s ORDER BY "createdAt" LIMIT 1
+        ''', (provider_name,))
         result = cur.fetchone()
-        
+        created = False
         if result:
             parking_service_id = result[0]
-            logging.info(f"Found existing parking service: {provider_name} (ID: {parking_service_id})")
-            cur.close()
-            return parking_service_id, created
-        
-        created = True
-        cur.execute('''
-            INSERT INTO "ParkingService" ("id", "name", "isActive", "createdAt", "updatedAt")
-            VALUES (gen_random_uuid(), %s, true, %s, %s)
-            RETURNING "id"
-        ''', (provider_name, datetime.now(), datetime.now()))
-        
-        parking_service_id = cur.fetchone()[0]
-        conn.commit()
-        logging.info(f"Created new parking service: {provider_name} (ID: {parking_service_id})")
-        cur.close()
-        
+        else:
+            now = datetime.now()
+            cur.execute('''
+                INSERT INTO "ParkingService" ("id", "name", "isActive", "createdAt", "updatedAt")
+                VALUES (gen_random_uuid(), %s, true, %s, %s)
+                RETURNING "id"
+            ''', (provider_name, now, now))
+            parking_service_id = cur.fetchone()[0]
+            created = True
+            logging.info(f"Created new parking service: {provider_name} (ID: {parking_service_id})")
+        self.parking_services[provider_name] = parking_service_id
         return parking_service_id, created
-        
-    except Exception as e:
-        logging.error(f"Error getting/creating parking service {provider_name}: {e}")
-        try:
-            conn.rollback()
-        except:
-            pass
-        return None, False
 
-def get_or_create_service_contract(conn, service_id, parking_service_id):
-    """Create connection between Service and ParkingService"""
-    try:
-        cur = conn.cursor()
-        created = False
-        
-        current_user_id = get_current_user()
-        if not current_user_id:
-            logging.error("Cannot create contract without current user")
-            return None, created
-        
+    def _resolve_services(self, cur, codes):
+        # Lock in sorted order so concurrent workers cannot deadlock
+        for code in codes:
+            lock_dimension(cur, "Service", code)
+        execute_prepared(cur, "select_services", '''
+            SELECT DISTINCT ON ("name") "name", "id" FROM "Service"
+            WHERE "name" = ANY(%s)
+            ORDER BY "name", "createdAt"
+        ''', (codes,))
+        self.services.update(dict(cur.fetchall()))
+
+        # Service has no unique key on name, so guard the insert with NOT EXISTS under the locks
+        to_create = [code for code in codes if code not in self.services]
+        if not to_create:
+            return []
+        now = datetime.now()
         cur.execute('''
-            SELECT "id" FROM "Contract" 
+            INSERT INTO "Service" ("id", "name", "type", "billingType", "description", "isActive", "createdAt", "updatedAt")
+            SELECT gen_random_uuid(), code, 'PARKING', 'PREPAID', 'Auto-created parking service: ' || code, true, %s, %s
+            FROM unnest(%s::text[]) AS code
+            WHERE NOT EXISTS (SELECT 1 FROM "Service" s WHERE s."name" = code)
+            RETURNING "name", "id"
+        ''', (now, now, to_create))
+        created = cur.fetchall()
+        self.services.update(dict(created))
+        logging.info(f"Created {len(created)} new services: {', '.join(code for code, _ in created)}")
+        return created
+
+    def _resolve_contract(self, cur, parking_service_id):
+        lock_dimension(cur, "Contract", parking_service_id)
+        execute_prepared(cur, "select_contract", '''
+            SELECT "id" FROM "Contract"
             WHERE "parkingServiceId" = %s AND "type" = 'PARKING' AND "status" = 'ACTIVE'
+            ORDER BY "createdAt" LIMIT 1
         ''', (parking_service_id,))
-        
         result = cur.fetchone()
         if result:
             contract_id = result[0]
-            logging.info(f"Found existing contract for parking service: {contract_id}")
-            
-            cur.execute('''
-                SELECT "id" FROM "ServiceContract" 
-                WHERE "contractId" = %s AND "serviceId" = %s
-            ''', (contract_id, service_id))
-            
-            service_contract_result = cur.fetchone()
-            if service_contract_result:
-                service_contract_id = service_contract_result[0]
-                logging.info(f"ServiceContract already exists: {service_contract_id}")
-                cur.close()
-                return service_contract_id, created
-            
-            created = True
+        else:
+            now = datetime.now()
             cur.execute('''
-                INSERT INTO "ServiceContract" ("id", "contractId", "serviceId", "createdAt", "updatedAt")
-                VALUES (gen_random_uuid(), %s, %s, %s, %s)
+                INSERT INTO "Contract" (
+                    "id", "name", "contractNumber", "type", "status", "startDate", "endDate", 
+                    "revenuePercentage", "parkingServiceId", "createdAt", "updatedAt", "createdById"
+                )
+                VALUES (gen_random_uuid(), %s, %s, 'PARKING', 'ACTIVE', %s, %s, %s, %s, %s, %s, %s)
                 RETURNING "id"
-            ''', (contract_id, service_id, datetime.now(), datetime.now()))
-            
-            service_contract_id = cur.fetchone()[0]
-            conn.commit()
-            logging.info(f"Created ServiceContract: {service_contract_id}")
-            cur.close()
-            return service_contract_id, created
-        
-        created = True
-        cur.execute('''
-            INSERT INTO "Contract" (
-                "id", "name", "contractNumber", "type", "status", "startDate", "endDate", 
-                "revenuePercentage", "parkingServiceId", "createdAt", "updatedAt", "createdById"
-            )
-            VALUES (gen_random_uuid(), %s, %s, 'PARKING', 'ACTIVE', %s, %s, %s, %s, %s, %s, %s)
-            RETURNING "id"
-        ''', (
-            f'Auto-generated contract for parking service',
-            f'AUTO-PARKING-{parking_service_id[:8]}-{datetime.now().strftime("%Y%m%d")}',
-            datetime.now(),
-            datetime.now().replace(year=datetime.now().year + 1),
-            10.0,
-            parking_service_id,
-            datetime.now(),
-            datetime.now(),
-            current_user_id
-        ))
-        
-        contract_id = cur.fetchone()[0]
-        
-        cur.execute('''
+            ''', (
+                'Auto-generated contract for parking service',
+                f'AUTO-PARKING-{parking_service_id[:8]}-{now.strftime("%Y%m%d")}',
+                now,
+                now.replace(year=now.year + 1),
+                10.0,
+                parking_service_id,
+                now,
+                now,
+                self.user_id
+            ))
+            contract_id = cur.fetchone()[0]
+            logging.info(f"Created new contract: {contract_id}")
+        self.contracts[parking_service_id] = contract_id
+        return contract_id
+
+    def _resolve_service_contracts(self, cur, contract_id, links):
+        service_ids = [service_id for _, service_id in links]
+        now = datetime.now()
+        execute_prepared(cur, "insert_service_contracts", '''
             INSERT INTO "ServiceContract" ("id", "contractId", "serviceId", "createdAt", "updatedAt")
-            VALUES (gen_random_uuid(), %s, %s, %s, %s)
-            RETURNING "id"
-        ''', (contract_id, service_id, datetime.now(), datetime.now()))
-        
-        service_contract_id = cur.fetchone()[0]
-        conn.commit()
-        
-        logging.info(f"Created new contract: {contract_id} and ServiceContract: {service_contract_id}")
-        cur.close()
-        
-        return service_contract_id, created
-        
-    except Exception as e:
-        logging.error(f"Error creating service contract: {e}")
-        try:
-            conn.rollback()
-        except:
-            pass
-        return None, False
+            SELECT gen_random_uuid(), %s, service_id, %s, %s
+            FROM unnest(%s::text[]) AS service_id
+            ON CONFLICT ("contractId", "serviceId") DO NOTHING
+            RETURNING "serviceId", "id"
+        ''', (contract_id, now, now, service_ids))
+        inserted = dict(cur.fetchall())
 
-def convert_to_float(val):
-    """Convert value to float"""
-    if isinstance(val, str):
-        val = val.replace(",", "").strip()
+        existing = [service_id for service_id in service_ids if service_id not in inserted]
+        if existing:
+            execute_prepared(cur, "select_service_contracts", '''
+                SELECT "serviceId", "id" FROM "ServiceContract"
+                WHERE "contractId" = %s AND "serviceId" = ANY(%s)
+            ''', (contract_id, existing))
+            for service_id, service_contract_id in cur.fetchall():
+                self.service_contracts[(contract_id, service_id)] = service_contract_id
+        for service_id, service_contract_id in inserted.items():
+            self.service_contracts[(contract_id, service_id)] = service_contract_id
+
+        codes = {service_id: code for code, service_id in links}
+        return [(codes[service_id], service_contract_id) for service_id, service_contract_id in inserted.items()]
+
+class ParseCache:
+    """Parsed report records stored as Parquet, keyed by content hash and PARSER_VERSION.
+
+    pyarrow is optional: without it the cache stays disabled and every file is
+    parsed. Entries from other parser versions are dropped and the least
+    recently used ones are evicted once the directory exceeds max_mb.
+    """
+
+    def __init__(self, directory, max_mb, enabled=True):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled and importlib.util.find_spec("pyarrow") is not None
+        if enabled and not self.enabled:
+            logging.info("pyarrow is not installed, parse cache disabled")
+
+    def path(self, file_hash):
+        return os.path.join(self.directory, f"{file_hash}.v{PARSER_VERSION}.parquet")
+
+    def get(self, file_hash):
+        """(records, service codes) for a previously parsed file, or None"""
+        if not self.enabled or not file_hash:
+            return None
+        path = self.path(file_hash)
+        if not os.path.exists(path):
+            return None
         try:
-            return float(val)
-        except ValueError:
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+            service_codes = set(json.loads(table.schema.metadata[b"service_codes"]))
+            records = table.to_pandas()
+            # Reads count as use for LRU eviction
+            os.utime(path)
+            return records, service_codes
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable parse cache entry {path}: {e}")
             return None
-    try:
-        return float(val)
-    except:
-        return None
 
-def extract_parking_provider(filename):
-    """Extract provider name from filename"""
-    try:
-        patterns = [
-            r"_mParking_(.+?)_\d+__\d+_",
-            r"Servis__MicropaymentMerchantReport_(.+?)__\d+_",
-            r"Parking_(.+?)_\d{8}"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, filename)
-            if match:
-                provider = match.group(1)
-                provider = provider.replace("_", " ").title()
-                provider = re.sub(r'\d{4,}', '', provider).strip()
-                return provider
-        
-        return f"Unknown_{os.path.basename(filename)[:10]}"
-    
-    except Exception as e:
-        return "Unknown"
+    def put(self, file_hash, records, service_codes):
+        if not self.enabled or not file_hash:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            os.makedirs(self.directory, exist_ok=True)
+            table = pa.Table.from_pandas(records, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[b"service_codes"] = json.dumps(list(service_codes)).encode("utf-8")
+            table = table.replace_schema_metadata(metadata)
+            # Write then rename so concurrent workers never see a partial file
+            path = self.path(file_hash)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, path)
+            self.evict()
+        except Exception as e:
+            logging.warning(f"Could not write parse cache entry for {file_hash}: {e}")
 
-def clean_date(date_val):
-    """Clean date values"""
-    if isinstance(date_val, str):
+    def evict(self):
+        """Drop entries of other parser versions, then the least recently used until under max_bytes"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.parquet")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not path.endswith(f".v{PARSER_VERSION}.parquet"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+class StageProfiler:
+    """Per-stage wall/CPU timers with tracemalloc peaks, plus optional per-file cProfile dumps.
+
+    A disabled profiler hands out one shared no-op context manager, so the
+    instrumented code paths cost nothing when profiling is off. tracemalloc
+    has a single process-wide peak counter, so peaks are only recorded when
+    one stage runs at a time; --pipeline overlaps stages on several threads
+    and passes track_memory=False.
+    """
+
+    NOOP = contextlib.nullcontext()
+
+    def __init__(self, enabled=False, profile_dir=None, track_memory=True):
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self.track_memory = track_memory
+        self.stats = {}  # stage -> [calls, wall seconds, cpu seconds, peak traced bytes or None]
+        self.lock = threading.Lock()
+        if enabled and track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        if not self.enabled:
+            return self.NOOP
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            peak = None
+            if self.track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak -= base
+            self.add(name, 1, wall, cpu, peak)
+
+    def add(self, name, calls, wall, cpu, peak):
+        # --pipeline records stages from its loader and archiver threads
+        with self.lock:
+            entry = self.stats.setdefault(name, [0, 0.0, 0.0, None])
+            entry[0] += calls
+            entry[1] += wall
+            entry[2] += cpu
+            if peak is not None:
+                entry[3] = peak if entry[3] is None else max(entry[3], peak)
+
+    def merge(self, stats):
+        """Fold in stats collected elsewhere, e.g. returned from a pool worker"""
+        for name, (calls, wall, cpu, peak) in stats.items():
+            self.add(name, calls, wall, cpu, peak)
+
+    def child(self):
+        """Empty profiler with the same settings, for one file"""
+        return StageProfiler(self.enabled, self.profile_dir, self.track_memory)
+
+    def reset(self):
+        self.stats = {}
+
+    def profile_file(self, input_file):
+        """cProfile the block and dump it to profile_dir/<file>.<timestamp>.prof"""
+        if not self.profile_dir:
+            return self.NOOP
+        return self._cprofile(input_file)
+
+    @contextlib.contextmanager
+    def _cprofile(self, input_file):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            dump_file = os.path.join(
+                self.profile_dir,
+                f"{os.path.basename(input_file)}.{datetime.now():%Y%m%d-%H%M%S}.prof"
+            )
+            profiler.dump_stats(dump_file)
+            logging.info(f"cProfile written to {dump_file}")
+
+    def log_summary(self):
+        """Log the per-stage table; stages run in pool workers are summed across workers"""
+        if not self.enabled or not self.stats:
+            return
+        total_wall = sum(entry[1] for entry in self.stats.values()) or 1.0
+        logging.info(f"{'stage':<16} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'share':>6} {'peak MB':>9}")
+        for name, (calls, wall, cpu, peak) in self.stats.items():
+            peak_mb = f"{peak / 1024 / 1024:.1f}" if peak is not None else "-"
+            logging.info(
+                f"{name:<16} {calls:>6} {wall:>9.3f} {cpu:>9.3f} {wall / total_wall:>6.1%} {peak_mb:>9}"
+            )
+        logging.info(f"Process peak RSS: {peak_memory_mb():.1f} MB")
+
+class RunContext:
+    """State shared by every stage of one import run, built once at startup.
+
+    Connections come from the module's connection_pool via get_db_connection,
+    which init_run_context opens before building the context.
+    """
+
+    def __init__(self, args, user_id):
+        self.args = args
+        self.user_id = user_id
+        self.dimensions = DimensionResolver(user_id)
+        self.audit = AuditLogWriter(AUDIT_FLUSH_EVENTS, AUDIT_FLUSH_SECONDS)
+        self.progress = ProgressReporter()
+        self.parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_MB, getattr(args, 'parse_cache', PARSE_CACHE))
+        self.profiler = StageProfiler(
+            getattr(args, 'profile', PROFILE),
+            getattr(args, 'profile_dir', PROFILE_DIR),
+            # Pipeline stages overlap on threads, which would share tracemalloc's one peak counter
+            not getattr(args, 'pipeline', PIPELINE)
+        )
+        # Set by serve(): one parse executor reused by every job instead of a new pool per job
+        self.parse_executor = None
+        self.counters = {
+            'files_found': 0,
+            'files_skipped': 0,
+            'files_processed': 0,
+            'files_failed': 0,
+            'records_parsed': 0,
+            'files_from_cache': 0,
+            'rows_inserted': 0,
+            'rows_updated': 0,
+            'rows_unchanged': 0,
+            'rows_deleted': 0,
+            'rows_rejected': 0
+        }
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def use_user(self, user_id):
+        self.user_id = user_id
+        self.dimensions.user_id = user_id
+
+    def begin_job(self, user_id):
+        """Reset per-job state for a new import while keeping the pool and dimension caches warm"""
+        self.use_user(user_id)
+        self.profiler.reset()
+        for name in self.counters:
+            self.counters[name] = 0
+
+    def summary(self):
+        return ", ".join(f"{name}={value}" for name, value in self.counters.items())
+
+def init_run_context(args, minconn=None, maxconn=None):
+    """Create the connection pool, resolve the acting user and build the run context"""
+    global run_context
+    run_context = None
+    if not connection_pool:
+        init_db_pool(minconn, maxconn)
+    
+    user_id = args.user_id
+    if user_id:
+        logging.info(f"Using authenticated user ID: {user_id}")
+    else:
+        logging.warning("No user ID provided, falling back to system user")
+        user_id = get_or_create_system_user()
+    
+    run_context = RunContext(args, user_id)
+    return run_context
+
+def convert_to_float(val):
+    """Convert value to float"""
+    if isinstance(val, str):
+        val = val.replace(",", "").strip()
+        try:
+            return float(val)
+        except ValueError:
+            return None
+    try:
+        return float(val)
+    except:
+        return None
+
+def extract_parking_provider(filename):
+    """Extract provider name from filename"""
+    try:
+        patterns = [
+            r"_mParking_(.+?)_\d+__\d+_",
+            r"Servis__MicropaymentMerchantReport_(.+?)__\d+_",
+            r"Parking_(.+?)_\d{8}"
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, filename)
+            if match:
+                provider = match.group(1)
+                provider = provider.replace("_", " ").title()
+                provider = re.sub(r'\d{4,}', '', provider).strip()
+                return provider
+        
+        return f"Unknown_{os.path.basename(filename)[:10]}"
+    
+    except Exception as e:
+        return "Unknown"
+
+def clean_date(date_val):
+    """Clean date values"""
+    if isinstance(date_val, str):
         date_val = date_val.strip()
         date_val = re.sub(r'\s+', ' ', date_val)
         date_val = date_val.replace(" ", "")
@@ -521,13 +1167,474 @@ def sanitize_parking_record(row):
         logging.error(f"Sanitization error: {e}")
         return None
 
-def process_excel(input_file):
-    """Process Excel files"""
+# Text columns that repeat the same few values on every row of a report
+COMPACT_COLUMNS = ["parkingServiceId", "serviceId", "group", "serviceName", "date"]
+
+def compact_records(records):
+    """Store the repeated text columns of parsed records as categoricals, so each distinct string is held once"""
+    for column in COMPACT_COLUMNS:
+        if column in records:
+            records[column] = records[column].astype("category")
+    return records
+
+def sanitize_parking_frame(df):
+    """Sanitize a DataFrame of parking records column by column and keep loadable prepaid rows"""
+    frame = pd.DataFrame({
+        # Plain object columns again, whether or not the records were compacted
+        'parkingServiceId': df['parkingServiceId'].astype(object),
+        'serviceId': df['serviceId'].astype(object),
+        'date': normalize.iso_date_column(df['date']),
+        'group': df['group'].astype(str),
+        'serviceName': normalize.service_code_column(df['serviceName'], as_text=True),
+        'price': normalize.float_column(df['price']),
+        'quantity': normalize.float_column(df['quantity']),
+        'amount': normalize.float_column(df['amount'])
+    })
+    
+    keep = frame['date'].notna() & (frame['quantity'] > 0) & (frame['group'] == 'prepaid')
+    return frame[keep].reset_index(drop=True)
+
+def loadable_rows(frame):
+    """Mask of sanitized rows ParkingTransaction can take: the NOT NULL key columns and serviceId are set.
+
+    Services without a 4-digit code have no serviceName or serviceId; left in,
+    one such row fails the whole set-based merge.
+    """
+    return frame[PARKING_TRANSACTION_KEY + ['serviceId']].notna().all(axis=1)
+
+def _parse_report_rows(rows):
+    """Row-by-row parse of the report sheet; reference implementation for parse_report_frame"""
+    if not rows:
+        return [], set()
+
+    header = [str(x).strip() for x in rows[0]]
+    date_cols = header[3:-1] if header[-1].upper() == "TOTAL" else header[3:]
+
+    current_group = "prepaid"
+    output_records = []
+    service_codes_in_file = set()
+
+    i = 1
+    while i < len(rows):
+        row = [str(x).strip() for x in rows[i]]
+        if not any(row):
+            i += 1
+            continue
+
+        if len(row) > 1 and "total" in row[1].lower():
+            i += 1
+            continue
+
+        if i == 1 and ("servis" in row[0].lower() or "izveštaj" in row[0].lower()):
+            i += 1
+            continue
+
+        for kw in GROUP_KEYWORDS:
+            if kw in row[0].lower():
+                current_group = kw
+                i += 1
+                break
+        else:
+            if row[0]:
+                service_name = row[0]
+                service_code = extract_service_code(service_name)
+                service_codes_in_file.add(service_code)
+                
+                price = convert_to_float(row[1])
+
+                quantity_values = row[3:-1] if header[-1].upper() == "TOTAL" else row[3:]
+
+                if i + 1 < len(rows):
+                    next_row = [str(x).strip() for x in rows[i+1]]
+                    amount_values = next_row[3:-1] if header[-1].upper() == "TOTAL" else next_row[3:]
+                else:
+                    amount_values = ["" for _ in range(len(date_cols))]
+
+                for j, date_val in enumerate(date_cols):
+                    cleaned_date = clean_date(date_val)
+                    quantity = convert_to_float(quantity_values[j]) if j < len(quantity_values) else None
+                    amount = convert_to_float(amount_values[j]) if j < len(amount_values) else None
+                    
+                    if quantity is not None and quantity > 0 and current_group == "prepaid":
+                        record = {
+                            "group": current_group,
+                            "serviceName": service_name,
+                            "serviceCode": service_code,
+                            "price": price,
+                            "date": cleaned_date,
+                            "quantity": quantity,
+                            "amount": amount
+                        }
+                        output_records.append(record)
+                i += 2
+            else:
+                i += 1
+
+    return output_records, service_codes_in_file
+
+def _cell_text(value):
+    """Stringify a sheet cell the way the row loop does (fillna(""), str, strip)"""
+    if pd.isna(value):
+        return ""
+    return str(value).strip()
+
+def _cell_float(value):
+    """convert_to_float for a raw sheet cell, NaN instead of None"""
+    result = convert_to_float(_cell_text(value))
+    return np.nan if result is None else result
+
+class UnknownReportLayout(ValueError):
+    """The report sheet does not match any registered ReportPlan"""
+
+class ReportPlan:
+    """Compiled extraction plan for one report layout.
+
+    A layout is fingerprinted once per workbook from its header row: which
+    sheet holds the report, how many label columns (name, price, Broj/Iznos)
+    precede the day columns, the shape of the day headers, whether a TOTAL
+    column closes the row and whether a banner row opens the body.
+    parse_report_frame then slices by the plan instead of re-deriving the
+    layout. New layouts are supported by registering a plan for their
+    fingerprint with register_report_plan.
+    """
+
+    def __init__(self, name, sheet_index, label_columns, date_shape, total_column, banner_row):
+        self.name = name
+        self.sheet_index = sheet_index
+        self.label_columns = label_columns
+        self.date_shape = date_shape
+        self.total_column = total_column
+        self.banner_row = banner_row
+        self.fingerprint = layout_fingerprint(sheet_index, label_columns, date_shape, total_column, banner_row)
+
+    def day_columns(self, width):
+        """Column slice holding the per-day values of a sheet width columns wide"""
+        return slice(self.label_columns, width - 1 if self.total_column else width)
+
+REPORT_PLANS = {}
+
+def layout_fingerprint(sheet_index, label_columns, date_shape, total_column, banner_row):
+    return (
+        f"sheet={sheet_index}|labels={label_columns}|dates={date_shape!r}|"
+        f"total={'yes' if total_column else 'no'}|banner={'yes' if banner_row else 'no'}"
+    )
+
+def register_report_plan(plan):
+    """Make a layout known; sheets with its fingerprint are parsed with the plan"""
+    REPORT_PLANS[plan.fingerprint] = plan
+    return plan
+
+def locate_report_sheet(sheet_names):
+    """Index of the first sheet after the summary sheets, or None if the workbook has only summaries"""
+    for index, name in enumerate(sheet_names):
+        if not name.startswith(SUMMARY_SHEET_PREFIXES):
+            return index
+    return None
+
+def report_fingerprint(header_row, first_body_row, sheet_index):
+    """Fingerprint of a report sheet's layout, read from its header row and first body row"""
+    header = [_cell_text(x) for x in header_row]
+    total_column = bool(header) and header[-1].upper() == "TOTAL"
+    day_stop = len(header) - 1 if total_column else len(header)
+    label_columns = next((i for i in range(1, day_stop) if re.search(r"\d", header[i])), day_stop)
+    shapes = sorted({re.sub(r"\d", "9", value) for value in header[label_columns:day_stop]})
+    first_body = _cell_text(first_body_row[0]).lower() if first_body_row else ""
+    banner_row = "servis" in first_body or "izveštaj" in first_body
+    return layout_fingerprint(sheet_index, label_columns, ",".join(shapes), total_column, banner_row)
+
+def report_plan(header_row, first_body_row, sheet_index):
+    """Registered ReportPlan for a sheet's header and first body row; raises UnknownReportLayout"""
+    fingerprint = report_fingerprint(header_row, first_body_row, sheet_index)
+    plan = REPORT_PLANS.get(fingerprint)
+    if plan is None:
+        raise UnknownReportLayout(f"Unknown report layout {fingerprint}; register a ReportPlan for it")
+    return plan
+
+# The MicropaymentMerchantReport export: three label columns, 'DD.MM.\nYYYY.' day headers, TOTAL last
+register_report_plan(ReportPlan("mparking-daily", 3, 3, "99.99.\n9999.", total_column=True, banner_row=False))
+register_report_plan(ReportPlan("mparking-daily-banner", 3, 3, "99.99.\n9999.", total_column=True, banner_row=True))
+
+class ReportSheet:
+    """A report sheet reduced to what parse_report_frame reads, filled row by row.
+
+    Per body row only the first two cells (as text), a blank-row flag, the
+    price and the day cells as floats are kept, so the sheet is never held as
+    an object matrix: the float day matrix, grown by doubling and trimmed by
+    finish(), is the largest part. Repeated text cells are converted once through a per-sheet memo.
+    """
+
+    def __init__(self, sheet_index, header_row, plan):
+        self.sheet_index = sheet_index
+        self.plan = plan
+        self.width = len(header_row)
+        self.days = plan.day_columns(self.width)
+        self.header = [_cell_text(x) for x in header_row]
+        self.rows = 0
+        self.labels = []
+        self.blank = []
+        self.prices = []
+        self.values = np.empty((64, len(self.header[self.days])), dtype=float)
+        self._floats = {}
+
+    def _float(self, value):
+        # Numbers convert directly; only text and other cells, which repeat, go through the memo
+        if type(value) is float or type(value) is int:
+            return float(value)
+        try:
+            return self._floats[value]
+        except KeyError:
+            result = self._floats[value] = _cell_float(value)
+            return result
+        except TypeError:
+            return _cell_float(value)
+
+    def append(self, row):
+        """Add one body row, padded or cut to the header width like a DataFrame column set"""
+        row = list(row[:self.width]) + [None] * (self.width - len(row))
+        if self.rows == len(self.values):
+            # In place (realloc); no views of the buffer exist until finish()
+            self.values.resize((2 * len(self.values), self.values.shape[1]), refcheck=False)
+        self.labels.append((_cell_text(row[0]), _cell_text(row[1]) if self.width > 1 else ""))
+        self.blank.append(all(value is None or _cell_text(value) == "" for value in row))
+        self.prices.append(self._float(row[1]) if self.width > 1 else np.nan)
+        self.values[self.rows] = [self._float(value) for value in row[self.days]]
+        self.rows += 1
+
+    def finish(self):
+        """Trim the day matrix to the rows read"""
+        self.values.resize((self.rows, self.values.shape[1]), refcheck=False)
+        return self
+
+def parse_report_frame(sheet, plan=None):
+    """Vectorized wide-to-long parse of a ReportSheet from read_report_sheet using its layout plan"""
+    plan = plan or sheet.plan
+    dates = np.array(normalize.clean_date_values(sheet.header[plan.day_columns(sheet.width)]), dtype=object)
+
+    n = sheet.rows
+    labels = np.array(sheet.labels, dtype=object).reshape(n, 2)
+    first = labels[:, 0]
+    first_lower = np.array([value.lower() for value in first], dtype=object)
+    second_lower = np.array([value.lower() for value in labels[:, 1]], dtype=object)
+
+    # Same precedence as the row loop: blank, TOTAL price cell, banner, group marker, service row
+    blank = np.array(sheet.blank, dtype=bool)
+    banner = np.zeros(n, dtype=bool)
+    banner[:1] = plan.banner_row
+    evaluated = ~blank & ~np.array(["total" in value for value in second_lower], dtype=bool) & ~banner
+
+    keyword = np.select(
+        [np.array([kw in value for value in first_lower], dtype=bool) for kw in GROUP_KEYWORDS],
+        GROUP_KEYWORDS,
+        default=""
+    )
+    is_marker = evaluated & (keyword != "")
+    candidate = evaluated & (keyword == "") & (first != "")
+
+    # A service row consumes the row below it (its amount row), so within a run of
+    # consecutive candidate rows only every other one starts a quantity/amount pair
+    positions = np.arange(n)
+    run_start = np.maximum.accumulate(np.where(candidate & ~np.r_[False, candidate[:-1]], positions, 0)) if n else positions
+    service = candidate & ((positions - run_start) % 2 == 0)
+    consumed = np.r_[False, service[:-1]]
+    marker = is_marker & ~consumed
+    group = pd.Series(np.where(marker, keyword, None)).ffill().fillna("prepaid").to_numpy()
+
+    service_rows = np.flatnonzero(service)
+    service_names = first[service_rows]
+    service_codes = normalize.service_code_column(pd.Series(service_names, dtype=object)).to_numpy()
+    prices = np.array(sheet.prices, dtype=float)[service_rows]
+
+    values = sheet.values
+    quantities = values[service_rows]
+    amounts = np.full(quantities.shape, np.nan)
+    has_amount_row = service_rows + 1 < n
+    amounts[has_amount_row] = values[service_rows[has_amount_row] + 1]
+
+    keep = (quantities > 0) & (group[service_rows] == "prepaid")[:, None]
+    rows_idx, cols_idx = np.nonzero(keep)
+
+    records = pd.DataFrame({
+        "group": group[service_rows][rows_idx],
+        "serviceName": service_names[rows_idx],
+        "serviceCode": service_codes[rows_idx],
+        "price": prices[rows_idx],
+        "date": dates[cols_idx],
+        "quantity": quantities[rows_idx, cols_idx],
+        "amount": amounts[rows_idx, cols_idx]
+    })
+    return records, set(service_codes.tolist())
+
+def reset_peak_memory():
+    """Reset the process peak RSS counter where the platform allows it (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as fout:
+            fout.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB"""
+    try:
+        with open("/proc/self/status") as fin:
+            for line in fin:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _select_sheet(sheet_names, sheet_index, selected):
+    """Resolve sheet_index (None = locate the report sheet) and record it in selected"""
+    if sheet_index is None:
+        sheet_index = locate_report_sheet(sheet_names)
+        if sheet_index is None:
+            raise UnknownReportLayout(f"No report sheet after the summary sheets: {', '.join(sheet_names)}")
+    if selected is not None:
+        selected['sheet_index'] = sheet_index
+    return sheet_index
+
+def _iter_xls_rows(input_file, sheet_index, selected=None):
+    import xlrd
+
+    # xlrd prints format warnings to stdout by default, which would corrupt --progress-json output
+    book = xlrd.open_workbook(input_file, on_demand=True, logfile=sys.stderr)
+    try:
+        sheet_index = _select_sheet(book.sheet_names(), sheet_index, selected)
+        if sheet_index >= book.nsheets:
+            raise ValueError(f"Worksheet index {sheet_index} is invalid, {book.nsheets} worksheets found")
+        sheet = book.sheet_by_index(sheet_index)
+        for r in range(sheet.nrows):
+            row = []
+            for cell_type, value in zip(sheet.row_types(r), sheet.row_values(r)):
+                # Same cell conversions as pandas' xlrd reader
+                if cell_type in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                    value = None
+                elif cell_type == xlrd.XL_CELL_NUMBER:
+                    value = int(value) if value.is_integer() else value
+                elif cell_type == xlrd.XL_CELL_BOOLEAN:
+                    value = bool(value)
+                elif cell_type == xlrd.XL_CELL_DATE:
+                    value = xlrd.xldate_as_datetime(value, book.datemode)
+                elif value == "":
+                    value = None
+                row.append(value)
+            yield row
+    finally:
+        book.release_resources()
+
+def _iter_xlsx_rows(input_file, sheet_index, selected=None):
+    import openpyxl
+
+    book = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        sheet_index = _select_sheet(book.sheetnames, sheet_index, selected)
+        if sheet_index >= len(book.worksheets):
+            raise ValueError(f"Worksheet index {sheet_index} is invalid, {len(book.worksheets)} worksheets found")
+        for row in book.worksheets[sheet_index].iter_rows(values_only=True):
+            yield [None if value == "" else value for value in row]
+    finally:
+        book.close()
+
+def iter_sheet_rows(input_file, sheet_index=None, selected=None):
+    """Yield typed rows of one worksheet, opening only that sheet (xlrd on_demand / openpyxl read-only).
+
+    sheet_index None reads the report sheet after the summary sheets; the
+    index actually read is stored in selected['sheet_index'].
+    """
+    if input_file.lower().endswith(".xls"):
+        return _iter_xls_rows(input_file, sheet_index, selected)
+    return _iter_xlsx_rows(input_file, sheet_index, selected)
+
+def read_report_sheet(input_file, sheet_index=None):
+    """Stream the report sheet into a ReportSheet, or None when it has no rows; logs the peak memory it took.
+
+    The layout plan is resolved from the header and first body row before the
+    rest is read, so an unknown layout raises UnknownReportLayout right away.
+    """
+    reset_peak_memory()
+    selected = {}
+    rows = iter_sheet_rows(input_file, sheet_index, selected)
+    header_row = next(rows, None)
+    if header_row is None:
+        return None
+    first_body_row = next(rows, None)
+    plan = report_plan(header_row, first_body_row, selected['sheet_index'])
+    sheet = ReportSheet(selected['sheet_index'], header_row, plan)
+    if first_body_row is not None:
+        sheet.append(first_body_row)
+    for row in rows:
+        sheet.append(row)
+    sheet.finish()
+    logging.info(
+        f"Read sheet {sheet.sheet_index} of {os.path.basename(input_file)}: "
+        f"{sheet.rows + 1}x{sheet.width} cells, peak memory {peak_memory_mb():.1f} MB"
+    )
+    return sheet
+
+def verify_parser(paths):
+    """Compare parse_report_frame with the row-by-row parser on the given report files"""
+    mismatches = 0
+    for path in paths:
+        try:
+            sheet = read_report_sheet(path)
+        except Exception as e:
+            logging.warning(f"Skipping {os.path.basename(path)}: {e}")
+            continue
+        if sheet is None:
+            continue
+
+        rows = [["" if value is None else value for value in row] for row in iter_sheet_rows(path, sheet.sheet_index)]
+        started = time.perf_counter()
+        legacy_records, legacy_codes = _parse_report_rows(rows)
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        records, codes = parse_report_frame(sheet)
+        vectorized_ms = (time.perf_counter() - started) * 1000
+
+        expected = pd.DataFrame.from_records(legacy_records, columns=records.columns)
+        same = codes == legacy_codes and len(expected) == len(records) and \
+            expected.astype(object).where(expected.notna(), None).values.tolist() == \
+            records.astype(object).where(records.notna(), None).values.tolist()
+        if not same:
+            mismatches += 1
+        logging.info(
+            f"{'OK' if same else 'MISMATCH'} {os.path.basename(path)}: {len(records)} records "
+            f"(row loop {legacy_ms:.1f} ms, vectorized {vectorized_ms:.1f} ms)"
+        )
+    return mismatches == 0
+
+def process_excel(input_file, file_hash=None, user_id=None):
+    """Process Excel files; user_id is the acting user when it may differ from the worker's"""
+    if user_id and user_id != run_context.user_id:
+        # The daemon's pool workers outlive jobs, so each file brings its job's user
+        run_context.use_user(user_id)
+    if file_hash is None and run_context.parse_cache.enabled:
+        file_hash = compute_file_hash(input_file)
+    profiler = run_context.profiler.child()
+    try:
+        with profiler.profile_file(input_file):
+            result = _process_excel(input_file, file_hash, profiler)
+    finally:
+        if getattr(run_context.args, 'serve', False):
+            # Nor can their queued audit events wait for the worker to exit
+            run_context.audit.flush()
+    if result and profiler.enabled:
+        # Per-file stats travel back with the result so pool workers are counted too
+        result['profile'] = profiler.stats
+    return result
+
+def _process_excel(input_file, file_hash, profiler):
+    """Parse one report (or load it from the parse cache) and resolve its dimensions, timing each stage on profiler"""
     conn = None
     try:
         conn = get_db_connection()
         # FIX 2: Get user ID early and safely
-        current_user_id = get_current_user()
+        current_user_id = run_context.user_id
         if not current_user_id:
             logging.error("No valid user ID available for logging")
             return []
@@ -541,38 +1648,50 @@ def process_excel(input_file):
             user_id=current_user_id
         )
         
-        df = pd.read_excel(input_file, sheet_name=3, header=None)
-        rows = df.fillna("").values.tolist()
-        
-        if not rows:
-            return []
-
-        header = [str(x).strip() for x in rows[0]]
-        date_cols = header[3:-1] if header[-1].upper() == "TOTAL" else header[3:]
+        started = time.perf_counter()
+        with profiler.stage("parse_cache"):
+            cached = run_context.parse_cache.get(file_hash)
+        if cached:
+            output_records, service_codes_in_file = cached
+            logging.info(f"Loaded {len(output_records)} parsed records from cache for {os.path.basename(input_file)}")
+        else:
+            # Unknown layouts fail while reading instead of parsing into an empty result
+            with profiler.stage("read"):
+                sheet = read_report_sheet(input_file)
+            
+            if sheet is None:
+                return []
 
-        current_group = "prepaid"
-        output_records = []
+            with profiler.stage("parse"):
+                output_records, service_codes_in_file = parse_report_frame(sheet)
+            run_context.parse_cache.put(file_hash, output_records, service_codes_in_file)
+        parse_ms = (time.perf_counter() - started) * 1000
         
         provider_name = extract_parking_provider(os.path.basename(input_file))
         logging.info(f"Extracted provider: {provider_name}")
         
-        parking_service_id, ps_created = get_or_create_parking_service(conn, provider_name)
-        if not parking_service_id:
-            raise Exception(f"Could not get/create parking service for {provider_name}")
+        started = time.perf_counter()
+        with profiler.stage("dimensions"):
+            dimensions = run_context.dimensions.resolve(conn, provider_name, service_codes_in_file)
+        dimensions_ms = (time.perf_counter() - started) * 1000
+        parking_service_id = dimensions['parking_service_id']
+        service_id_mapping = dimensions['service_ids']
+        created = dimensions['created']
 
         # Update ParkingService with file information
         file_size = os.path.getsize(input_file)
-        update_parking_service_file_info(
-            conn, 
-            parking_service_id, 
-            os.path.basename(input_file), 
-            input_file, 
-            file_size, 
-            "in_progress", 
-            current_user_id
-        )
+        with profiler.stage("file_info"):
+            update_parking_service_file_info(
+                conn, 
+                parking_service_id, 
+                os.path.basename(input_file), 
+                input_file, 
+                file_size, 
+                "in_progress", 
+                current_user_id
+            )
 
-        if ps_created:
+        if created['parking_service']:
             log_to_database(
                 conn,
                 entity_type="ParkingService",
@@ -582,98 +1701,29 @@ def process_excel(input_file):
                 user_id=current_user_id
             )
 
-        service_codes_in_file = set()
-
-        i = 1
-        while i < len(rows):
-            row = [str(x).strip() for x in rows[i]]
-            if not any(row):
-                i += 1
-                continue
-
-            if len(row) > 1 and "total" in row[1].lower():
-                i += 1
-                continue
-
-            if i == 1 and ("servis" in row[0].lower() or "izveštaj" in row[0].lower()):
-                i += 1
-                continue
-
-            for kw in ["prepaid", "postpaid", "total"]:
-                if kw in row[0].lower():
-                    current_group = kw
-                    i += 1
-                    break
-            else:
-                if row[0]:
-                    service_name = row[0]
-                    service_code = extract_service_code(service_name)
-                    service_codes_in_file.add(service_code)
-                    
-                    price = convert_to_float(row[1])
-
-                    quantity_values = row[3:-1] if header[-1].upper() == "TOTAL" else row[3:]
-
-                    if i + 1 < len(rows):
-                        next_row = [str(x).strip() for x in rows[i+1]]
-                        amount_values = next_row[3:-1] if header[-1].upper() == "TOTAL" else next_row[3:]
-                    else:
-                        amount_values = ["" for _ in range(len(date_cols))]
-
-                    for j, date_val in enumerate(date_cols):
-                        cleaned_date = clean_date(date_val)
-                        quantity = convert_to_float(quantity_values[j]) if j < len(quantity_values) else None
-                        amount = convert_to_float(amount_values[j]) if j < len(amount_values) else None
-                        
-                        if quantity is not None and quantity > 0 and current_group == "prepaid":
-                            record = {
-                                "parkingServiceId": parking_service_id,
-                                "serviceId": None,
-                                "group": current_group,
-                                "serviceName": service_name,
-                                "serviceCode": service_code,
-                                "price": price,
-                                "date": cleaned_date,
-                                "quantity": quantity,
-                                "amount": amount
-                            }
-                            output_records.append(record)
-                    i += 2
-                else:
-                    i += 1
+        for service_code, service_id in created['services']:
+            log_to_database(
+                conn,
+                entity_type="Service",
+                entity_id=service_id,
+                action="CREATE",
+                subject=f"Created service {service_code}",
+                user_id=current_user_id
+            )
 
-        service_id_mapping = {}
-        for service_code in service_codes_in_file:
-            service_id, service_created = get_or_create_service(conn, service_code, 'PARKING', 'PREPAID')
-            if service_id:
-                service_id_mapping[service_code] = service_id
-                
-                if service_created:
-                    log_to_database(
-                        conn,
-                        entity_type="Service",
-                        entity_id=service_id,
-                        action="CREATE",
-                        subject=f"Created service {service_code}",
-                        user_id=current_user_id
-                    )
-                
-                service_contract_id, contract_created = get_or_create_service_contract(conn, service_id, parking_service_id)
-                if service_contract_id and contract_created:
-                    log_to_database(
-                        conn,
-                        entity_type="ServiceContract",
-                        entity_id=service_contract_id,
-                        action="CREATE",
-                        subject=f"Created service contract for {service_code}",
-                        user_id=current_user_id
-                    )
+        for service_code, service_contract_id in created['service_contracts']:
+            log_to_database(
+                conn,
+                entity_type="ServiceContract",
+                entity_id=service_contract_id,
+                action="CREATE",
+                subject=f"Created service contract for {service_code}",
+                user_id=current_user_id
+            )
 
-        for record in output_records:
-            service_code = record.get('serviceCode')
-            if service_code in service_id_mapping:
-                record['serviceId'] = service_id_mapping[service_code]
-            record.pop('serviceCode', None)
+        output_records.insert(0, 'parkingServiceId', parking_service_id)
+        output_records.insert(1, 'serviceId', output_records['serviceCode'].map(service_id_mapping))
+        output_records = compact_records(output_records.drop(columns=['serviceCode']))
 
         logging.info(f"Processed {input_file}: {len(output_records)} records")
         
@@ -683,14 +1733,23 @@ def process_excel(input_file):
             'parking_service_id': parking_service_id,
             'provider_name': provider_name,
             'filename': os.path.basename(input_file),
-            'current_user_id': current_user_id
+            'current_user_id': current_user_id,
+            'service_count': len(service_id_mapping),
+            'from_cache': bool(cached),
+            'created': {
+                'parking_service': bool(created['parking_service']),
+                'services': len(created['services']),
+                'service_contracts': len(created['service_contracts'])
+            },
+            # Measured where the file was parsed, which may be a pool worker
+            'timings': {'parse_ms': round(parse_ms, 1), 'dimensions_ms': round(dimensions_ms, 1)}
         }
         
     except Exception as e:
         logging.error(f"Error processing file {input_file}: {e}")
         # FIX 2: Safely handle user ID in error logging
         try:
-            user_id = current_user_id if 'current_user_id' in locals() else get_current_user()
+            user_id = run_context.user_id
             if conn:
                 log_to_database(
                     conn,
@@ -709,13 +1768,19 @@ def process_excel(input_file):
         if conn:
             return_db_connection(conn)
 
-def save_to_csv(data, output_file):
-    """Save data to CSV"""
-    if not data:
+def save_to_csv(data, output_file, append=False):
+    """Save data to CSV, or add it to the end of an existing export with append"""
+    if data is None or len(data) == 0:
         return
 
     fieldnames = ["parkingServiceId", "serviceId", "group", "serviceName", "price", "date", "quantity", "amount"]
     try:
+        if isinstance(data, pd.DataFrame):
+            if append:
+                data.to_csv(output_file, columns=fieldnames, index=False, mode="a", header=False, encoding="utf-8")
+                return
+            data.to_csv(output_file, columns=fieldnames, index=False, encoding="utf-8-sig")
+            return
         with open(output_file, "w", newline="", encoding="utf-8-sig") as fout:
             writer = csv.DictWriter(fout, fieldnames=fieldnames)
             writer.writeheader()
@@ -724,101 +1789,694 @@ def save_to_csv(data, output_file):
         logging.error(f"Error saving CSV: {e}")
         raise
 
-def import_to_postgresql(csv_path):
-    """Import data to PostgreSQL"""
-    conn = None
-    try:
-        conn = get_db_connection()
-        df = pd.read_csv(csv_path)
-        
-        sanitized_data = []
-        for _, row in df.iterrows():
-            sanitized_row = sanitize_parking_record(row)
-            if (sanitized_row and sanitized_row['date'] and 
-                sanitized_row['quantity'] > 0 and 
-                sanitized_row['group'] == 'prepaid'):
-                sanitized_data.append(sanitized_row)
-                logging.info(f"First record data: {sanitized_data[0]}")
-
-        if not sanitized_data:
-            return
+PARKING_TRANSACTION_COLUMNS = ["parkingServiceId", "date", "group", "serviceName", "price", "quantity", "amount", "serviceId"]
 
-        cur = conn.cursor()
-        inserted_count = 0
-        updated_count = 0
-        error_count = 0
-        
-        for i, record in enumerate(sanitized_data):
-            try:
-                upsert_sql = """
-                INSERT INTO "ParkingTransaction" (
-                    "id", "parkingServiceId", "date", "group", "serviceName", 
-                    "price", "quantity", "amount", "createdAt", "serviceId"
-                )
-                VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT ("parkingServiceId", "date", "serviceName", "group")
-                DO UPDATE SET
-                    "price" = EXCLUDED."price",
-                    "quantity" = EXCLUDED."quantity",
-                    "amount" = EXCLUDED."amount"
-                RETURNING (xmax = 0) AS inserted;
-                """
-                
-                cur.execute(upsert_sql, (
-                    record['parkingServiceId'],
-                    record['date'],
-                    record['group'],
-                    record['serviceName'],
-                    record['price'],
-                    record['quantity'],
-                    record['amount'],
-                    datetime.now(),
-                    record['serviceId']
-                ))
-                
-                result = cur.fetchone()
-                if result and result[0]:
-                    inserted_count += 1
-                else:
-                    updated_count += 1
+def upsert_parking_transactions(conn, df):
+    """Upsert ParkingTransaction rows one statement per record"""
+    records = df[PARKING_TRANSACTION_COLUMNS].to_dict("records")
+    cur = conn.cursor()
+    inserted_count = 0
+    updated_count = 0
+    error_count = 0
+    # Rows upserted since the last commit; they only count once committed
+    pending_inserted = 0
+    pending_updated = 0
+    
+    for i, record in enumerate(records):
+        try:
+            upsert_sql = """
+            INSERT INTO "ParkingTransaction" (
+                "id", "parkingServiceId", "date", "group", "serviceName", 
+                "price", "quantity", "amount", "createdAt", "serviceId"
+            )
+            VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT ("parkingServiceId", "date", "serviceName", "group")
+            DO UPDATE SET
+                "price" = EXCLUDED."price",
+                "quantity" = EXCLUDED."quantity",
+                "amount" = EXCLUDED."amount"
+            RETURNING (xmax = 0) AS inserted;
+            """
+            
+            execute_prepared(cur, "upsert_parking_transaction", upsert_sql, (
+                record['parkingServiceId'],
+                record['date'],
+                record['group'],
+                record['serviceName'],
+                record['price'],
+                record['quantity'],
+                record['amount'],
+                datetime.now(),
+                record['serviceId']
+            ))
+            
+            result = cur.fetchone()
+            if result and result[0]:
+                pending_inserted += 1
+            else:
+                pending_updated += 1
+            
+            if (i + 1) % 50 == 0:
+                conn.commit()
+                inserted_count += pending_inserted
+                updated_count += pending_updated
+                pending_inserted = pending_updated = 0
                 
-                if (i + 1) % 50 == 0:
-                    conn.commit()
-                    
-            except Exception as e:
-                error_count += 1
-                logging.error(f"Error on record {i}: {e}")
-                try:
-                    conn.rollback()
-                    cur = conn.cursor()
-                except:
-                    pass
-                continue
+        except Exception as e:
+            # The rollback also drops the rows upserted earlier in this batch
+            error_count += 1 + pending_inserted + pending_updated
+            pending_inserted = pending_updated = 0
+            logging.error(f"Error on record {i}: {e}")
+            try:
+                conn.rollback()
+                cur = conn.cursor()
+            except:
+                pass
+            continue
 
+    try:
+        # Committed in batches of 50 above; the touched months are recomputed with the last one
+        update_monthly_rollups(cur, df)
+        conn.commit()
+        inserted_count += pending_inserted
+        updated_count += pending_updated
+    except Exception as e:
+        logging.error(f"Final commit failed: {e}")
+        # The last batch is lost and the rollup no longer matches the committed rows:
+        # count them as errors so the ledger leaves the file "partial" and importable
+        error_count += max(pending_inserted + pending_updated, 1)
         try:
-            conn.commit()
-        except Exception as e:
-            logging.error(f"Final commit failed: {e}")
-            
-        cur.close()
+            conn.rollback()
+        except:
+            pass
         
-        logging.info(f"Import completed: {inserted_count} inserted, {updated_count} updated, {error_count} errors")
+    cur.close()
+    return inserted_count, updated_count, error_count
 
-    except Exception as e:
-        logging.exception("IMPORT FAILURE:")
-        raise
-    finally:
-        if conn:
-            return_db_connection(conn)
+def stage_parking_transactions(cur, df):
+    """COPY the frame into the transaction-scoped ParkingTransactionStage table, keeping row order in ord"""
+    cur.execute("""
+    CREATE TEMP TABLE "ParkingTransactionStage" (
+        "ord" integer,
+        "parkingServiceId" text,
+        "date" timestamp(3),
+        "group" text,
+        "serviceName" text,
+        "price" double precision,
+        "quantity" double precision,
+        "amount" double precision,
+        "serviceId" text
+    ) ON COMMIT DROP
+    """)
+    
+    buffer = io.StringIO()
+    df[PARKING_TRANSACTION_COLUMNS].reset_index(drop=True).to_csv(buffer, header=False, index=True)
+    buffer.seek(0)
+    
+    cur.copy_expert(
+        'COPY "ParkingTransactionStage" ("ord", "parkingServiceId", "date", "group", "serviceName", '
+        '"price", "quantity", "amount", "serviceId") FROM STDIN WITH (FORMAT csv)',
+        buffer
+    )
 
-def create_parking_service_directory(provider_name, year):
-    """Create directory structure for parking service"""
-    try:
-        # Sanitize provider name for filesystem
-        safe_provider_name = re.sub(r'[^\w\s-]', '', provider_name)
-        safe_provider_name = re.sub(r'[-\s]+', '-', safe_provider_name)
-        
-        # Create directory path
+def touched_rollup_months(df):
+    """Distinct (parkingServiceId, first day of month) pairs of a sanitized frame, in lock order"""
+    touched = pd.DataFrame({
+        'parkingServiceId': df['parkingServiceId'].astype(str),
+        'month': df['date'].astype(str).str[:7] + '-01'
+    }).drop_duplicates().sort_values(['parkingServiceId', 'month'])
+    return list(touched.itertuples(index=False, name=None))
+
+def refresh_monthly_rollups(cur, months):
+    """Recompute ParkingMonthlyRollup for (parkingServiceId, month) pairs from the detail rows.
+
+    Runs in the caller's transaction, so the totals commit or roll back with
+    the load that changed them. A transaction-scoped lock per parking service
+    keeps two concurrent loads of one provider from interleaving their
+    recomputation. Returns the number of rollup rows written.
+    """
+    if not months:
+        return 0
+    for parking_service_id in sorted({parking_service_id for parking_service_id, _ in months}):
+        lock_dimension(cur, "rollup", parking_service_id)
+    touched = ([parking_service_id for parking_service_id, _ in months], [month for _, month in months])
+    
+    # Whole months are rebuilt, so a service that no longer has rows in a month loses its rollup too
+    cur.execute("""
+    DELETE FROM "ParkingMonthlyRollup" r
+    USING unnest(%s::text[], %s::timestamp[]) AS t("parkingServiceId", "month")
+    WHERE r."parkingServiceId" = t."parkingServiceId" AND r."month" = t."month"
+    """, touched)
+    cur.execute("""
+    INSERT INTO "ParkingMonthlyRollup" (
+        "id", "parkingServiceId", "serviceId", "month", "quantity", "amount", "transactionCount", "updatedAt"
+    )
+    SELECT gen_random_uuid(), p."parkingServiceId", p."serviceId", t."month",
+        sum(p."quantity"), sum(p."amount"), count(*), %s
+    FROM unnest(%s::text[], %s::timestamp[]) AS t("parkingServiceId", "month")
+    JOIN "ParkingTransaction" p
+      ON p."parkingServiceId" = t."parkingServiceId"
+     AND p."date" >= t."month"
+     AND p."date" < t."month" + interval '1 month'
+    GROUP BY p."parkingServiceId", p."serviceId", t."month"
+    ON CONFLICT ("parkingServiceId", "serviceId", "month") DO UPDATE SET
+        "quantity" = EXCLUDED."quantity",
+        "amount" = EXCLUDED."amount",
+        "transactionCount" = EXCLUDED."transactionCount",
+        "updatedAt" = EXCLUDED."updatedAt"
+    """, (datetime.now(),) + touched)
+    return cur.rowcount
+
+def update_monthly_rollups(cur, df):
+    """Recompute the rollup months a loaded frame touched, unless PARKING_MONTHLY_ROLLUPS is off"""
+    if MONTHLY_ROLLUPS:
+        refresh_monthly_rollups(cur, touched_rollup_months(df))
+
+def rebuild_monthly_rollups():
+    """Recompute every ParkingMonthlyRollup row from ParkingTransaction in one transaction"""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+        SELECT DISTINCT "parkingServiceId", to_char(date_trunc('month', "date"), 'YYYY-MM-DD')
+        FROM "ParkingTransaction"
+        ORDER BY 1, 2
+        """)
+        months = cur.fetchall()
+        cur.execute('DELETE FROM "ParkingMonthlyRollup"')
+        written = refresh_monthly_rollups(cur, months)
+        conn.commit()
+        cur.close()
+        logging.info(f"Rebuilt {written} monthly rollups for {len(months)} provider months")
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        return_db_connection(conn)
+
+def bulk_load_parking_transactions(conn, df):
+    """Load ParkingTransaction rows with COPY into a staging table and one set-based upsert"""
+    cur = conn.cursor()
+    try:
+        stage_parking_transactions(cur, df)
+        
+        # Later rows win on duplicate keys, same as the row-by-row upsert
+        cur.execute("""
+        WITH merged AS (
+            INSERT INTO "ParkingTransaction" (
+                "id", "parkingServiceId", "date", "group", "serviceName", 
+                "price", "quantity", "amount", "createdAt", "serviceId"
+            )
+            SELECT DISTINCT ON ("parkingServiceId", "date", "serviceName", "group")
+                gen_random_uuid(), "parkingServiceId", "date", "group", "serviceName",
+                "price", "quantity", "amount", %s, "serviceId"
+            FROM "ParkingTransactionStage"
+            ORDER BY "parkingServiceId", "date", "serviceName", "group", "ord" DESC
+            ON CONFLICT ("parkingServiceId", "date", "serviceName", "group")
+            DO UPDATE SET
+                "price" = EXCLUDED."price",
+                "quantity" = EXCLUDED."quantity",
+                "amount" = EXCLUDED."amount"
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted) FROM merged
+        """, (datetime.now(),))
+        
+        inserted_count = cur.fetchone()[0]
+        update_monthly_rollups(cur, df)
+        conn.commit()
+        
+        # Every staged row is either a new key or an update of an existing one
+        updated_count = len(df) - inserted_count
+        return inserted_count, updated_count, 0
+        
+    except Exception:
+        try:
+            conn.rollback()
+        except:
+            pass
+        raise
+    finally:
+        cur.close()
+
+def delta_load_parking_transactions(conn, df, delete_missing=False):
+    """Write only what changed: insert new keys, update rows whose values differ, optionally delete vanished rows.
+
+    Identical re-imports then produce no new tuple versions or WAL. Returns
+    (inserted, updated, unchanged, deleted) counted over distinct keys.
+    """
+    cur = conn.cursor()
+    try:
+        stage_parking_transactions(cur, df)
+        
+        # One row per key; later rows win, same as the upsert
+        cur.execute("""
+        CREATE TEMP TABLE "ParkingTransactionDelta" ON COMMIT DROP AS
+        SELECT DISTINCT ON ("parkingServiceId", "date", "serviceName", "group")
+            "parkingServiceId", "date", "group", "serviceName", "price", "quantity", "amount", "serviceId"
+        FROM "ParkingTransactionStage"
+        ORDER BY "parkingServiceId", "date", "serviceName", "group", "ord" DESC
+        """)
+        staged_count = cur.rowcount
+        
+        cur.execute("""
+        UPDATE "ParkingTransaction" t
+        SET "price" = d."price", "quantity" = d."quantity", "amount" = d."amount"
+        FROM "ParkingTransactionDelta" d
+        WHERE t."parkingServiceId" = d."parkingServiceId"
+          AND t."date" = d."date"
+          AND t."serviceName" = d."serviceName"
+          AND t."group" = d."group"
+          AND (t."price", t."quantity", t."amount") IS DISTINCT FROM (d."price", d."quantity", d."amount")
+        """)
+        updated_count = cur.rowcount
+        
+        cur.execute("""
+        INSERT INTO "ParkingTransaction" (
+            "id", "parkingServiceId", "date", "group", "serviceName", 
+            "price", "quantity", "amount", "createdAt", "serviceId"
+        )
+        SELECT gen_random_uuid(), d."parkingServiceId", d."date", d."group", d."serviceName",
+            d."price", d."quantity", d."amount", %s, d."serviceId"
+        FROM "ParkingTransactionDelta" d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "ParkingTransaction" t
+            WHERE t."parkingServiceId" = d."parkingServiceId"
+              AND t."date" = d."date"
+              AND t."serviceName" = d."serviceName"
+              AND t."group" = d."group"
+        )
+        ON CONFLICT ("parkingServiceId", "date", "serviceName", "group") DO NOTHING
+        """, (datetime.now(),))
+        inserted_count = cur.rowcount
+        
+        deleted_count = 0
+        if delete_missing:
+            # Rows inside a re-imported (service, group, date range) that the reports no longer contain
+            cur.execute("""
+            DELETE FROM "ParkingTransaction" t
+            USING (
+                SELECT "parkingServiceId", "group", min("date") AS first_date, max("date") AS last_date
+                FROM "ParkingTransactionDelta"
+                GROUP BY "parkingServiceId", "group"
+            ) s
+            WHERE t."parkingServiceId" = s."parkingServiceId"
+              AND t."group" = s."group"
+              AND t."date" BETWEEN s.first_date AND s.last_date
+              AND NOT EXISTS (
+                  SELECT 1 FROM "ParkingTransactionDelta" d
+                  WHERE d."parkingServiceId" = t."parkingServiceId"
+                    AND d."date" = t."date"
+                    AND d."serviceName" = t."serviceName"
+                    AND d."group" = t."group"
+              )
+            """)
+            deleted_count = cur.rowcount
+        
+        update_monthly_rollups(cur, df)
+        conn.commit()
+        unchanged_count = staged_count - inserted_count - updated_count
+        return inserted_count, updated_count, unchanged_count, deleted_count
+        
+    except Exception:
+        try:
+            conn.rollback()
+        except:
+            pass
+        raise
+    finally:
+        cur.close()
+
+PARKING_TRANSACTION_KEY = ["parkingServiceId", "date", "serviceName", "group"]
+
+def upsert_parking_chunk(cur, rows, created_at):
+    """Upsert (PARKING_TRANSACTION_COLUMNS..., createdAt) tuples in one statement; returns how many were new keys"""
+    results = extras.execute_values(cur, """
+        INSERT INTO "ParkingTransaction" (
+            "id", "parkingServiceId", "date", "group", "serviceName", 
+            "price", "quantity", "amount", "serviceId", "createdAt"
+        )
+        VALUES %s
+        ON CONFLICT ("parkingServiceId", "date", "serviceName", "group")
+        DO UPDATE SET
+            "price" = EXCLUDED."price",
+            "quantity" = EXCLUDED."quantity",
+            "amount" = EXCLUDED."amount"
+        RETURNING (xmax = 0) AS inserted
+    """, [row + (created_at,) for row in rows],
+        template="(gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        page_size=len(rows),
+        fetch=True
+    )
+    return sum(1 for (inserted,) in results if inserted)
+
+def load_parking_chunk(cur, rows, created_at, rejects):
+    """Upsert rows under a savepoint; if that fails, roll back to it and bisect until the failing rows are isolated.
+
+    Failing rows are appended to rejects as (row, error). Returns how many rows were new keys.
+    """
+    cur.execute("SAVEPOINT parking_chunk")
+    try:
+        inserted = upsert_parking_chunk(cur, rows, created_at)
+        cur.execute("RELEASE SAVEPOINT parking_chunk")
+        return inserted
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT parking_chunk")
+        cur.execute("RELEASE SAVEPOINT parking_chunk")
+        if len(rows) == 1:
+            rejects.append((rows[0], str(e).strip().splitlines()[0]))
+            return 0
+        middle = len(rows) // 2
+        return (
+            load_parking_chunk(cur, rows[:middle], created_at, rejects)
+            + load_parking_chunk(cur, rows[middle:], created_at, rejects)
+        )
+
+def write_reject_file(rejects, source_name=None):
+    """Write rejected rows with their database error to a CSV in REJECT_DIR and return its path"""
+    os.makedirs(REJECT_DIR, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_name))[0] if source_name else "parking"
+    reject_file = os.path.join(REJECT_DIR, f"{stem}.{datetime.now():%Y%m%d-%H%M%S}.rejects.csv")
+    with open(reject_file, "w", newline="", encoding="utf-8-sig") as fout:
+        writer = csv.writer(fout)
+        writer.writerow(PARKING_TRANSACTION_COLUMNS + ["error"])
+        for row, error in rejects:
+            writer.writerow(list(row) + [error])
+    return reject_file
+
+def atomic_load_parking_transactions(conn, df, source_name=None, chunk_rows=ATOMIC_CHUNK_ROWS):
+    """Load one report's rows in a single transaction, committing once.
+
+    Rows are upserted chunk by chunk, each chunk under a savepoint; rows that
+    still fail once their chunk is bisected down to them are rejected and
+    written to a reject file before the commit. If anything else fails the
+    whole file is rolled back. Returns (inserted, updated, rejected).
+    """
+    # Later rows win on duplicate keys, same as the other loaders
+    frame = df[PARKING_TRANSACTION_COLUMNS].drop_duplicates(PARKING_TRANSACTION_KEY, keep="last").astype(object)
+    rows = list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+    created_at = datetime.now()
+    rejects = []
+    inserted_count = 0
+
+    cur = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_rows):
+            inserted_count += load_parking_chunk(cur, rows[start:start + chunk_rows], created_at, rejects)
+        if rejects:
+            # Recorded before the commit, so a row is never dropped without a trace
+            reject_file = write_reject_file(rejects, source_name)
+            logging.warning(f"{len(rejects)} rows of {source_name or 'the batch'} rejected, written to {reject_file}")
+        update_monthly_rollups(cur, df)
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except:
+            pass
+        raise
+    finally:
+        cur.close()
+
+    updated_count = len(df) - inserted_count - len(rejects)
+    return inserted_count, updated_count, len(rejects)
+
+def export_parquet_partitions(records, provider_names, export_dir, mode="replace", replaced=None):
+    """Write normalized records to export_dir/provider=<name>/month=<YYYY-MM>/ as Parquet.
+
+    records are the parsed records of one run; provider_names maps
+    parkingServiceId to provider name. In "replace" mode each touched partition
+    is rebuilt in a sibling directory and swapped in, so a re-imported month
+    never shows up twice; "append" adds a part file next to the existing ones.
+    A run that exports report by report passes the same `replaced` set each
+    time: partitions already replaced by an earlier report are appended to.
+    Returns the number of partitions written.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        logging.warning("pyarrow is not installed, skipping Parquet export")
+        return 0
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = sanitize_parking_frame(records)
+    frame = frame[loadable_rows(frame)]
+    if frame.empty:
+        return 0
+    # Same winner as the database load when a key appears more than once
+    frame = frame.drop_duplicates(["parkingServiceId", "date", "serviceName", "group"], keep="last")
+    frame.insert(0, 'providerName', frame['parkingServiceId'].map(provider_names))
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['importedAt'] = pd.Timestamp(datetime.now())
+    months = frame['date'].dt.strftime('%Y-%m')
+
+    partitions = 0
+    for (provider_name, month), partition in frame.groupby([frame['providerName'], months], sort=True):
+        partition_dir = os.path.join(export_dir, f"provider={provider_directory_name(provider_name)}", f"month={month}")
+        part_name = f"part-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        table = pa.Table.from_pandas(partition.reset_index(drop=True), preserve_index=False)
+
+        partition_mode = mode
+        if replaced is not None and mode == "replace":
+            partition_mode = "append" if partition_dir in replaced else "replace"
+            replaced.add(partition_dir)
+        if partition_mode == "append":
+            os.makedirs(partition_dir, exist_ok=True)
+            temp_path = os.path.join(partition_dir, f".{part_name}.tmp")
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, os.path.join(partition_dir, part_name))
+        else:
+            staging_dir = f"{partition_dir}.staging-{uuid.uuid4().hex[:8]}"
+            os.makedirs(staging_dir)
+            pq.write_table(table, os.path.join(staging_dir, part_name))
+            retired_dir = None
+            if os.path.exists(partition_dir):
+                retired_dir = f"{partition_dir}.retired-{uuid.uuid4().hex[:8]}"
+                os.rename(partition_dir, retired_dir)
+            os.rename(staging_dir, partition_dir)
+            if retired_dir:
+                shutil.rmtree(retired_dir, ignore_errors=True)
+        partitions += 1
+
+    logging.info(f"Exported {len(frame)} records to {partitions} Parquet partitions in {export_dir} ({mode})")
+    return partitions
+
+def import_to_postgresql(source, source_name=None):
+    """Import data to PostgreSQL from a DataFrame of parsed records or a CSV export"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        df = source if isinstance(source, pd.DataFrame) else pd.read_csv(source)
+        profiler = run_context.profiler
+        
+        with profiler.stage("normalize"):
+            sanitized_data = sanitize_parking_frame(df)
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'errors': 0, 'rejected': 0}
+        loadable = loadable_rows(sanitized_data)
+        if not loadable.all():
+            unloadable = sanitized_data[~loadable][PARKING_TRANSACTION_COLUMNS].astype(object)
+            rejects = [
+                (row, "no 4-digit service code: serviceName/serviceId missing")
+                for row in unloadable.where(unloadable.notna(), None).itertuples(index=False, name=None)
+            ]
+            reject_file = write_reject_file(rejects, source_name)
+            logging.warning(f"{len(rejects)} rows of {source_name or 'the batch'} cannot be loaded, written to {reject_file}")
+            counts['rejected'] = len(rejects)
+            sanitized_data = sanitized_data[loadable].reset_index(drop=True)
+        if sanitized_data.empty:
+            return counts
+        logging.info(f"First record data: {sanitized_data.iloc[0].to_dict()}")
+
+        if getattr(run_context.args, 'atomic', ATOMIC_LOAD):
+            # No row-by-row fallback: the file either commits (minus rejected rows) or is rolled back
+            with profiler.stage("load_atomic"):
+                inserted_count, updated_count, rejected_count = atomic_load_parking_transactions(
+                    conn, sanitized_data, source_name, getattr(run_context.args, 'chunk_rows', ATOMIC_CHUNK_ROWS)
+                )
+            logging.info(f"Atomic import completed: {inserted_count} inserted, {updated_count} updated, {rejected_count} rejected")
+            counts.update(inserted=inserted_count, updated=updated_count, rejected=counts['rejected'] + rejected_count)
+            return counts
+
+        delta = getattr(run_context.args, 'delta', DELTA_LOAD)
+        if delta:
+            delete_missing = getattr(run_context.args, 'delete_missing', DELETE_MISSING)
+            try:
+                with profiler.stage("load_delta"):
+                    inserted_count, updated_count, unchanged_count, deleted_count = delta_load_parking_transactions(
+                        conn, sanitized_data, delete_missing
+                    )
+                logging.info(
+                    f"Delta import completed: {inserted_count} inserted, {updated_count} updated, "
+                    f"{unchanged_count} unchanged, {deleted_count} deleted"
+                )
+                counts.update(inserted=inserted_count, updated=updated_count, unchanged=unchanged_count, deleted=deleted_count)
+                return counts
+            except Exception as e:
+                if delete_missing:
+                    # The row-by-row upsert cannot delete vanished rows; fail the file so it stays importable
+                    logging.error(f"Delta load with --delete-missing failed: {e}")
+                    raise
+                logging.error(f"Delta load failed, falling back to row-by-row upsert: {e}")
+                with profiler.stage("load_rowwise"):
+                    inserted_count, updated_count, error_count = upsert_parking_transactions(conn, sanitized_data)
+        elif BULK_LOAD:
+            try:
+                with profiler.stage("load"):
+                    inserted_count, updated_count, error_count = bulk_load_parking_transactions(conn, sanitized_data)
+            except Exception as e:
+                # Fall back to row-by-row so a single bad record cannot sink the whole batch
+                logging.error(f"Bulk load failed, falling back to row-by-row upsert: {e}")
+                with profiler.stage("load_rowwise"):
+                    inserted_count, updated_count, error_count = upsert_parking_transactions(conn, sanitized_data)
+        else:
+            with profiler.stage("load_rowwise"):
+                inserted_count, updated_count, error_count = upsert_parking_transactions(conn, sanitized_data)
+        
+        logging.info(f"Import completed: {inserted_count} inserted, {updated_count} updated, {error_count} errors")
+        counts.update(inserted=inserted_count, updated=updated_count, errors=error_count)
+        return counts
+
+    except Exception as e:
+        logging.exception("IMPORT FAILURE:")
+        raise
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+def compute_file_hash(file_path):
+    """SHA-256 of the file content, used as the import ledger key"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fin:
+        for chunk in iter(lambda: fin.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_report_period(filename):
+    """Extract the report period (start, end) from a ..._20250501_0000__20250531_2359 filename"""
+    match = re.search(r'__(\d{8})_\d{4}__(\d{8})_\d{4}', filename)
+    if not match:
+        return None, None
+    try:
+        return tuple(datetime.strptime(value, "%Y%m%d") for value in match.groups())
+    except ValueError:
+        return None, None
+
+def get_imported_files(file_hashes):
+    """Return ledger rows of files that were already imported successfully, keyed by hash"""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        execute_prepared(cur, "select_imported_files", '''
+            SELECT "fileHash", "providerName", "parkingServiceId", "rowCount"
+            FROM "ParkingImportLedger"
+            WHERE "fileHash" = ANY(%s) AND "status" = 'completed'
+        ''', (list(file_hashes),))
+        imported = {
+            row[0]: {'provider_name': row[1], 'parking_service_id': row[2], 'row_count': row[3]}
+            for row in cur.fetchall()
+        }
+        conn.commit()
+        cur.close()
+        return imported
+    except Exception as e:
+        logging.warning(f"Import ledger unavailable, processing all files: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
+        return {}
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+def record_import_ledger(entries, status, user_id):
+    """Insert or update import ledger rows for processed files"""
+    if not entries:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        now = datetime.now()
+        for entry in entries:
+            period_start, period_end = extract_report_period(entry['filename'])
+            execute_prepared(cur, "upsert_import_ledger", '''
+                INSERT INTO "ParkingImportLedger" (
+                    "id", "fileHash", "fileName", "providerName", "parkingServiceId",
+                    "periodStart", "periodEnd", "rowCount", "status", "importedBy", "createdAt", "updatedAt"
+                )
+                VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT ("fileHash") DO UPDATE SET
+                    "fileName" = EXCLUDED."fileName",
+                    "providerName" = COALESCE(EXCLUDED."providerName", "ParkingImportLedger"."providerName"),
+                    "parkingServiceId" = COALESCE(EXCLUDED."parkingServiceId", "ParkingImportLedger"."parkingServiceId"),
+                    "rowCount" = EXCLUDED."rowCount",
+                    "status" = EXCLUDED."status",
+                    "importedBy" = EXCLUDED."importedBy",
+                    "updatedAt" = EXCLUDED."updatedAt"
+            ''', (
+                entry['file_hash'],
+                entry['filename'],
+                entry.get('provider_name'),
+                entry.get('parking_service_id'),
+                period_start,
+                period_end,
+                entry.get('row_count', 0),
+                status,
+                user_id,
+                now,
+                now
+            ))
+        conn.commit()
+        cur.close()
+        logging.info(f"Import ledger: {len(entries)} files marked {status}")
+    except Exception as e:
+        logging.warning(f"Could not update import ledger: {e}")
+        try:
+            conn.rollback()
+        except:
+            pass
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+def skip_imported_files(excel_files, file_hashes):
+    """Archive files whose exact content was already imported and return the ones left to process"""
+    imported = get_imported_files(set(file_hashes.values()))
+    if not imported:
+        return excel_files
+
+    remaining = []
+    for file_path in excel_files:
+        entry = imported.get(file_hashes[file_path])
+        if not entry or not entry['parking_service_id']:
+            remaining.append(file_path)
+            continue
+        
+        logging.info(f"Skipping unchanged file (already imported, {entry['row_count']} rows): {os.path.basename(file_path)}")
+        move_file_to_service_directory(
+            file_path,
+            entry['parking_service_id'],
+            entry['provider_name'],
+            os.path.basename(file_path),
+            run_context.user_id
+        )
+        run_context.count('files_skipped')
+    return remaining
+
+def provider_directory_name(provider_name):
+    """Provider name usable as a directory name"""
+    safe_name = re.sub(r'[^\w\s-]', '', provider_name)
+    return re.sub(r'[-\s]+', '-', safe_name)
+
+def create_parking_service_directory(provider_name, year):
+    """Create directory structure for parking service"""
+    try:
+        # Sanitize provider name for filesystem
+        safe_provider_name = provider_directory_name(provider_name)
+        
+        # Create directory path
         base_path = os.path.join(PROJECT_ROOT, "public", "parking-servis", safe_provider_name, "reports", year)
         
         # Create directory if it doesn't exist
@@ -913,85 +2571,844 @@ def move_file_to_service_directory(source_file, parking_service_id, provider_nam
         if conn:
             return_db_connection(conn)
 
+def _init_worker(args):
+    """Set up a pool worker process with the run's arguments and its own connection pool"""
+    global cli_args
+    # Workers inherit the parent's stdout, which carries only events under --progress-json
+    configure_logging(sys.stderr if getattr(args, 'progress_json', False) else sys.stdout)
+    cli_args = args
+    # Import up front so a profiled worker does not charge pandas' import to its first stage
+    for module in HEAVY_MODULES:
+        module.load()
+    context = init_run_context(args, 1, 2)
+    # atexit runs last-registered first: flush queued audit events before the pool closes
+    atexit.register(close_db_pool)
+    atexit.register(context.audit.flush)
+
+def iter_processed_files(excel_files, workers=1, file_hashes=None):
+    """Yield (file_path, result, error) per file, parsing in a process pool when workers > 1"""
+    file_hashes = file_hashes or {}
+    if workers <= 1:
+        for file_path in excel_files:
+            logging.info(f"Processing file: {os.path.basename(file_path)}")
+            run_context.progress.emit('file_started', file=os.path.basename(file_path))
+            try:
+                result, error = process_excel(file_path, file_hashes.get(file_path)), None
+            except Exception as e:
+                result, error = None, e
+            yield file_path, result, error
+        return
+
+    def collect(file_path, future):
+        try:
+            return file_path, future.result(), None
+        except Exception as e:
+            return file_path, None, e
+
+    logging.info(f"Processing {len(excel_files)} files with {workers} workers")
+    with parse_executor(run_context, workers) as executor:
+        # Consume in submission order so the load order matches a sequential run; at most
+        # two files per worker are in flight, so finished results never pile up unconsumed
+        in_flight = collections.deque()
+        for file_path in excel_files:
+            if len(in_flight) >= 2 * workers:
+                yield collect(*in_flight.popleft())
+            in_flight.append((
+                file_path,
+                executor.submit(process_excel, file_path, file_hashes.get(file_path), run_context.user_id)
+            ))
+            run_context.progress.emit('file_started', file=os.path.basename(file_path))
+        while in_flight:
+            yield collect(*in_flight.popleft())
+
+def count_loaded_rows(context, counts):
+    """Add an import_to_postgresql result to the run counters"""
+    context.count('rows_inserted', counts['inserted'])
+    context.count('rows_updated', counts['updated'])
+    context.count('rows_unchanged', counts['unchanged'])
+    context.count('rows_deleted', counts['deleted'])
+    context.count('rows_rejected', counts['rejected'])
+
+def record_parsed_file(context, result, file_hash):
+    """Report and count one parsed file; returns its import ledger entry"""
+    emit = context.progress.emit
+    if result['from_cache']:
+        context.count('files_from_cache')
+    emit(
+        'rows_parsed',
+        file=result['filename'],
+        rows=len(result['records']),
+        cached=result['from_cache'],
+        ms=result['timings']['parse_ms']
+    )
+    emit(
+        'dimensions_resolved',
+        file=result['filename'],
+        provider=result['provider_name'],
+        parkingServiceId=result['parking_service_id'],
+        services=result['service_count'],
+        created=result['created'],
+        ms=result['timings']['dimensions_ms']
+    )
+    if 'profile' in result:
+        context.profiler.merge(result['profile'])
+    context.count('files_processed')
+    context.count('records_parsed', len(result['records']))
+    return {
+        'file_hash': file_hash,
+        'filename': result['filename'],
+        'provider_name': result['provider_name'],
+        'parking_service_id': result['parking_service_id'],
+        'row_count': len(result['records'])
+    }
+
+def archive_parsed_file(context, file_path, result):
+    """Move a parsed report into its provider's directory and report it"""
+    started = time.perf_counter()
+    with context.profiler.stage("move"):
+        target_file = move_file_to_service_directory(
+            file_path,
+            result['parking_service_id'],
+            result['provider_name'],
+            result['filename'],
+            result['current_user_id']
+        )
+    
+    logging.info(f"Successfully processed and moved: {result['filename']}")
+    context.progress.emit(
+        'file_moved',
+        file=result['filename'],
+        target=target_file,
+        ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+
+def move_to_error_folder(file_path):
+    """Move a report that could not be imported to ERROR_FOLDER"""
+    try:
+        error_file = os.path.join(ERROR_FOLDER, os.path.basename(file_path))
+        shutil.move(file_path, error_file)
+        logging.info(f"Moved problematic file to error folder: {error_file}")
+    except Exception as move_error:
+        logging.error(f"Could not move file to error folder: {move_error}")
+
+def record_failed_file(context, file_path, file_hash, error):
+    """Count and report a file that failed to parse or load; returns its import ledger entry"""
+    logging.error(f"Error processing file {os.path.basename(file_path)}: {error}")
+    context.count('files_failed')
+    context.progress.emit('file_failed', file=os.path.basename(file_path), error=str(error))
+    return {'file_hash': file_hash, 'filename': os.path.basename(file_path)}
+
+def ledger_status(counts):
+    """Import ledger status for a load result: rows that failed or were rejected leave it "partial",
+    so the file is not skipped as already imported the next time it is uploaded"""
+    return "partial" if counts['errors'] or counts['rejected'] else "completed"
+
+def load_report(entry, records):
+    """import_to_postgresql for one report in its own transaction(s), then mark it in the import ledger"""
+    try:
+        counts = import_to_postgresql(records, entry['filename'])
+    except Exception:
+        record_import_ledger([entry], "failed", run_context.user_id)
+        raise
+    with run_context.profiler.stage("ledger_write"):
+        record_import_ledger([entry], ledger_status(counts), run_context.user_id)
+    return counts
+
+def record_loaded_report(context, entry, records, counts, started):
+    """Count and report one report's load result"""
+    count_loaded_rows(context, counts)
+    context.progress.emit(
+        'rows_loaded',
+        file=entry['filename'],
+        rows=len(records),
+        ms=round((time.perf_counter() - started) * 1000, 1),
+        **counts
+    )
+
+def load_files_atomically(context, loaded_entries, parsed_frames):
+    """Load each report in its own transaction and return the entries and records that were committed.
+
+    A file whose load fails is rolled back and marked failed in the ledger
+    without stopping the others.
+    """
+    committed_entries = []
+    committed_frames = []
+    for entry, records in zip(loaded_entries, parsed_frames):
+        started = time.perf_counter()
+        try:
+            counts = load_report(entry, records)
+        except Exception as e:
+            logging.error(f"Load of {entry['filename']} rolled back: {e}")
+            context.count('files_failed')
+            context.progress.emit('file_failed', file=entry['filename'], error=str(e))
+            continue
+        record_loaded_report(context, entry, records, counts, started)
+        committed_entries.append(entry)
+        committed_frames.append(records)
+    
+    records = pd.concat(committed_frames, ignore_index=True) if committed_frames else None
+    return committed_entries, records
+
+def export_loaded_records(context, loaded_entries, all_records, replaced=None):
+    """Write the loaded records to the Parquet dataset when --export-parquet is on"""
+    if not loaded_entries or not getattr(context.args, 'export_parquet', EXPORT_PARQUET):
+        return
+    # The export is a by-product; a failure here must not fail the import that already committed
+    try:
+        started = time.perf_counter()
+        with context.profiler.stage("export"):
+            partitions = export_parquet_partitions(
+                all_records,
+                {entry['parking_service_id']: entry['provider_name'] for entry in loaded_entries},
+                getattr(context.args, 'export_dir', EXPORT_DIR),
+                getattr(context.args, 'export_mode', EXPORT_MODE),
+                replaced
+            )
+        context.progress.emit('partitions_exported', partitions=partitions, ms=round((time.perf_counter() - started) * 1000, 1))
+    except Exception as e:
+        logging.error(f"Parquet export failed: {e}")
+
+def stream_files(context, excel_files, workers=1, file_hashes=None):
+    """Load each report as soon as it is parsed, then drop it; returns (loaded entries, failed entries).
+
+    Only the reports still in flight in the parse workers are held in memory,
+    so peak memory does not grow with the number of files. The CSV export is
+    appended to report by report, and each Parquet partition is replaced by
+    the first report that touches it and appended to by the ones after it.
+    """
+    loaded_entries = []
+    failed_entries = []
+    replaced_partitions = set()
+    for file_path, result, error in iter_processed_files(excel_files, workers, file_hashes):
+        if error is None and (not result or result['records'].empty):
+            error = "No records found"
+        if error is not None:
+            failed_entries.append(record_failed_file(context, file_path, file_hashes[file_path], error))
+            move_to_error_folder(file_path)
+            continue
+
+        entry = record_parsed_file(context, result, file_hashes[file_path])
+        records = result['records']
+        started = time.perf_counter()
+        try:
+            counts = load_report(entry, records)
+        except Exception as e:
+            logging.error(f"Load of {entry['filename']} rolled back: {e}")
+            context.count('files_failed')
+            context.progress.emit('file_failed', file=entry['filename'], error=str(e))
+            move_to_error_folder(file_path)
+            continue
+        record_loaded_report(context, entry, records, counts, started)
+        if EXPORT_CSV:
+            save_to_csv(records, OUTPUT_FILE, append=bool(loaded_entries))
+        loaded_entries.append(entry)
+        export_loaded_records(context, [entry], records, replaced_partitions)
+        # Archived after the load: a crash in between leaves the file in the input folder,
+        # and the next run finds it in the ledger and only moves it
+        archive_parsed_file(context, file_path, result)
+    return loaded_entries, failed_entries
+
+def make_parse_executor(workers):
+    """Executor for process_excel: a spawn process pool for workers > 1, else one thread"""
+    if workers <= 1:
+        # Parsing in a thread keeps using the run's dimension cache; the pool is thread-safe
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+    # Hand workers the resolved user so they never race to create the system user
+    worker_args = argparse.Namespace(**vars(run_context.args))
+    worker_args.user_id = run_context.user_id
+    # spawn, not fork: forked children would share the parent's pooled sockets
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(worker_args,)
+    )
+
+@contextlib.contextmanager
+def parse_executor(context, workers):
+    """The daemon's long-lived executor when it has one, else a new one for this run"""
+    if context.parse_executor is not None:
+        yield context.parse_executor
+        return
+    with make_parse_executor(workers) as executor:
+        yield executor
+
+async def run_pipeline(context, excel_files, workers=1, file_hashes=None):
+    """Parse, load and archive reports concurrently; returns (loaded entries, loaded records, failed entries).
+
+    Three stages joined by bounded queues: parsing runs in an executor
+    (up to 2 x `workers` files in flight), a loader thread imports each report
+    with import_to_postgresql in file order, and an archiver thread moves
+    loaded files into their provider directories and files that failed to
+    parse or load into ERROR_FOLDER. When the loader falls
+    behind, the parse stage blocks on the full queue instead of piling up
+    parsed frames, so memory stays bounded by the queue size.
+    """
+    loop = asyncio.get_running_loop()
+    file_hashes = file_hashes or {}
+    queue_size = getattr(context.args, 'pipeline_queue', PIPELINE_QUEUE_SIZE)
+    load_queue = asyncio.Queue(maxsize=queue_size)
+    archive_queue = asyncio.Queue(maxsize=queue_size)
+    loaded_entries = []
+    loaded_frames = []
+    failed_entries = []
+
+    async def dispatch(file_path, result, error):
+        if error is None and (not result or result['records'].empty):
+            error = "No records found"
+        if error is not None:
+            failed_entries.append(record_failed_file(context, file_path, file_hashes[file_path], error))
+            await archive_queue.put((file_path, None))
+            return
+        entry = record_parsed_file(context, result, file_hashes[file_path])
+        await load_queue.put((file_path, entry, result))
+
+    async def parse_stage(executor):
+        # Results are consumed in submission order so files load in the same order as a sequential run
+        in_flight = collections.deque()
+
+        async def next_result():
+            file_path, future = in_flight.popleft()
+            try:
+                result, error = await future, None
+            except Exception as e:
+                result, error = None, e
+            await dispatch(file_path, result, error)
+
+        for file_path in excel_files:
+            # One file queued behind each busy worker, so workers don't idle while the oldest finishes
+            if len(in_flight) >= 2 * workers:
+                await next_result()
+            logging.info(f"Processing file: {os.path.basename(file_path)}")
+            context.progress.emit('file_started', file=os.path.basename(file_path))
+            in_flight.append((
+                file_path,
+                loop.run_in_executor(executor, process_excel, file_path, file_hashes.get(file_path), context.user_id)
+            ))
+        while in_flight:
+            await next_result()
+        await load_queue.put(None)
+
+    async def load_stage():
+        # Files are handed to the archiver only once their load outcome is known
+        while (item := await load_queue.get()) is not None:
+            file_path, entry, result = item
+            records = result['records']
+            started = time.perf_counter()
+            try:
+                counts = await asyncio.to_thread(load_report, entry, records)
+            except Exception as e:
+                logging.error(f"Load of {entry['filename']} failed: {e}")
+                context.count('files_failed')
+                context.progress.emit('file_failed', file=entry['filename'], error=str(e))
+                await archive_queue.put((file_path, None))
+                continue
+            record_loaded_report(context, entry, records, counts, started)
+            loaded_entries.append(entry)
+            loaded_frames.append(records)
+            await archive_queue.put((file_path, result))
+        # The parse stage is done by now, so no parse failure can follow this
+        await archive_queue.put(None)
+
+    async def archive_stage():
+        while (item := await archive_queue.get()) is not None:
+            file_path, result = item
+            if result is None:
+                await asyncio.to_thread(move_to_error_folder, file_path)
+                continue
+            try:
+                await asyncio.to_thread(archive_parsed_file, context, file_path, result)
+            except Exception as e:
+                logging.error(f"Could not archive {result['filename']}: {e}")
+
+    with parse_executor(context, workers) as executor:
+        await asyncio.gather(parse_stage(executor), load_stage(), archive_stage())
+
+    records = pd.concat(loaded_frames, ignore_index=True) if loaded_frames else None
+    return loaded_entries, records, failed_entries
+
+def run_import(context, excel_files, force=False, workers=1):
+    """Import the given report files and return the run counters.
+
+    Progress is reported through context.progress: file_started, rows_parsed,
+    dimensions_resolved, file_moved, file_skipped, file_failed, rows_loaded and
+    run_completed events.
+    """
+    emit = context.progress.emit
+
+    logging.info(f"Found {len(excel_files)} Excel files to process")
+    context.count('files_found', len(excel_files))
+    
+    profiler = context.profiler
+    with profiler.stage("hash"):
+        file_hashes = {file_path: compute_file_hash(file_path) for file_path in excel_files}
+    if not force:
+        with profiler.stage("ledger_check"):
+            remaining = skip_imported_files(excel_files, file_hashes)
+        for file_path in excel_files:
+            if file_path not in remaining:
+                emit('file_skipped', file=os.path.basename(file_path), reason='already imported')
+        excel_files = remaining
+        if not excel_files:
+            logging.info("All files were already imported, nothing to do")
+            profiler.log_summary()
+            emit('run_completed', counters=context.counters)
+            return context.counters
+    
+    if getattr(context.args, 'stream', STREAM_LOAD):
+        loaded_entries, failed_entries = stream_files(context, excel_files, workers, file_hashes)
+        if loaded_entries:
+            logging.info("Data import to PostgreSQL completed")
+        record_import_ledger(failed_entries, "failed", context.user_id)
+        profiler.log_summary()
+        emit('run_completed', counters=context.counters)
+        return context.counters
+    
+    if getattr(context.args, 'pipeline', PIPELINE):
+        # Each report is loaded and ledgered as soon as it is parsed
+        loaded_entries, all_records, failed_entries = asyncio.run(
+            run_pipeline(context, excel_files, workers, file_hashes)
+        )
+        if all_records is not None and EXPORT_CSV:
+            save_to_csv(all_records, OUTPUT_FILE)
+            logging.info(f"Saved {len(all_records)} records to {OUTPUT_FILE}")
+        export_loaded_records(context, loaded_entries, all_records)
+        record_import_ledger(failed_entries, "failed", context.user_id)
+        profiler.log_summary()
+        emit('run_completed', counters=context.counters)
+        return context.counters
+    
+    parsed_frames = []
+    loaded_entries = []
+    failed_entries = []
+    
+    for file_path, result, error in iter_processed_files(excel_files, workers, file_hashes):
+        try:
+            if error:
+                raise error
+            
+            if result and not result['records'].empty:
+                loaded_entries.append(record_parsed_file(context, result, file_hashes[file_path]))
+                parsed_frames.append(result['records'])
+                
+                # Move file to appropriate directory structure
+                archive_parsed_file(context, file_path, result)
+            else:
+                # Move to error folder if no records
+                error_file = os.path.join(ERROR_FOLDER, os.path.basename(file_path))
+                shutil.move(file_path, error_file)
+                logging.warning(f"No records found, moved to error folder: {error_file}")
+                context.count('files_failed')
+                failed_entries.append({'file_hash': file_hashes[file_path], 'filename': os.path.basename(file_path)})
+                emit('file_failed', file=os.path.basename(file_path), error="No records found")
+                
+        except Exception as e:
+            failed_entries.append(record_failed_file(context, file_path, file_hashes[file_path], e))
+            # Move problematic file to error folder
+            move_to_error_folder(file_path)
+            continue
+    
+    if parsed_frames:
+        all_records = pd.concat(parsed_frames, ignore_index=True)
+        
+        # CSV is only a side export; the importer gets the parsed records directly
+        if EXPORT_CSV:
+            save_to_csv(all_records, OUTPUT_FILE)
+            logging.info(f"Saved {len(all_records)} records to {OUTPUT_FILE}")
+        
+        # Import to PostgreSQL. --delete-missing deletes inside the loaded rows' date range, which
+        # must be one report's period: on the concatenated batch, April and June reports of one
+        # provider would delete all of May
+        delete_missing = getattr(context.args, 'delta', DELTA_LOAD) and getattr(context.args, 'delete_missing', DELETE_MISSING)
+        if getattr(context.args, 'atomic', ATOMIC_LOAD) or delete_missing:
+            loaded_entries, all_records = load_files_atomically(context, loaded_entries, parsed_frames)
+        else:
+            try:
+                started = time.perf_counter()
+                counts = import_to_postgresql(all_records)
+                count_loaded_rows(context, counts)
+                emit(
+                    'rows_loaded',
+                    rows=len(all_records),
+                    ms=round((time.perf_counter() - started) * 1000, 1),
+                    **counts
+                )
+            except Exception:
+                record_import_ledger(loaded_entries, "failed", context.user_id)
+                raise
+            with profiler.stage("ledger_write"):
+                # The batch is one load, so failed rows cannot be pinned to a file: all of them stay importable
+                record_import_ledger(loaded_entries, ledger_status(counts), context.user_id)
+        
+        export_loaded_records(context, loaded_entries, all_records)
+        logging.info("Data import to PostgreSQL completed")
+    else:
+        logging.info("No records to save")
+    
+    record_import_ledger(failed_entries, "failed", context.user_id)
+    profiler.log_summary()
+    emit('run_completed', counters=context.counters)
+    return context.counters
+
+def list_input_files():
+    """Excel files waiting in the input folder"""
+    excel_files = glob.glob(os.path.join(FOLDER_PATH, "*.xlsx"))
+    excel_files.extend(glob.glob(os.path.join(FOLDER_PATH, "*.xls")))
+    return excel_files
+
+def resolve_input_files(files):
+    """Split requested report paths into (real paths inside FOLDER_PATH, rejected paths).
+
+    Paths are resolved with realpath first, so neither ../ nor a symlink can
+    point the importer (which moves what it imports under public/) at any
+    other file.
+    """
+    input_root = os.path.realpath(FOLDER_PATH)
+    accepted = []
+    rejected = []
+    for file_path in files:
+        real_path = os.path.realpath(str(file_path))
+        if os.path.dirname(real_path) == input_root and os.path.isfile(real_path):
+            accepted.append(real_path)
+        else:
+            rejected.append(file_path)
+    return accepted, rejected
+
+class ImportRequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface of the resident importer.
+
+    GET /health reports liveness. POST /import takes {"userId", "files", "force"},
+    where files must lie in the input folder, and streams the run's progress events one JSON object per line, then a
+    final "done" (with the run counters) or "error" event.
+    """
+
+    protocol_version = "HTTP/1.0"
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_event(self, event):
+        try:
+            self.wfile.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        except OSError:
+            # The client went away; the import itself carries on
+            pass
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {'error': 'not found'})
+            return
+        self.send_json(200, {'status': 'ok', 'busy': self.server.job_lock.locked()})
+
+    def do_POST(self):
+        if self.path != "/import":
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            job = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_json(400, {'error': f"invalid JSON body: {e}"})
+            return
+
+        files = job.get('files')
+        if files is not None and not isinstance(files, list):
+            self.send_json(400, {'error': '"files" must be a list of paths'})
+            return
+        if files:
+            files, rejected = resolve_input_files(files)
+            if rejected:
+                self.send_json(400, {'error': 'files must be existing reports in the input folder', 'files': rejected})
+                return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        # One import at a time: jobs share the run context, the input folder and the ledger
+        with self.server.job_lock:
+            context = run_context
+            context.begin_job(job.get('userId') or self.server.default_user_id)
+            context.progress = ProgressReporter(self.write_event)
+            started = time.perf_counter()
+            try:
+                excel_files = files or list_input_files()
+                if not excel_files:
+                    logging.info("No Excel files found in input folder")
+                counters = run_import(
+                    context,
+                    excel_files,
+                    force=bool(job.get('force')),
+                    workers=self.server.workers
+                )
+                context.audit.flush()
+                logging.info(f"Run summary: {context.summary()}")
+                self.write_event({
+                    'event': 'done',
+                    'counters': counters,
+                    'seconds': round(time.perf_counter() - started, 3)
+                })
+            except Exception as e:
+                logging.exception("Import job failed:")
+                context.audit.flush()
+                # Cached ids may be what broke the job (e.g. rows deleted from the app)
+                context.dimensions.invalidate()
+                if context.parse_executor is not None:
+                    # Pool workers cache ids too, and a worker that died leaves the pool broken
+                    context.parse_executor.shutdown(cancel_futures=True)
+                    context.parse_executor = make_parse_executor(self.server.workers)
+                self.write_event({'event': 'error', 'message': str(e)})
+            finally:
+                context.progress = ProgressReporter()
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer counterpart listening on a Unix domain socket"""
+    daemon_threads = True
+
+def serve(context, socket_path=None, host="127.0.0.1", port=8765, workers=1):
+    """Keep the connection and parse worker pools, caches and imported modules warm and run import jobs sent over HTTP"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, ImportRequestHandler)
+        os.chmod(socket_path, 0o660)
+        location = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), ImportRequestHandler)
+        location = f"http://{host}:{port}"
+
+    server.job_lock = threading.Lock()
+    server.default_user_id = context.user_id
+    server.workers = workers
+    if workers > 1:
+        # Workers import pandas/psycopg2 and open their connections once, not once per job
+        context.parse_executor = make_parse_executor(workers)
+    # Load the caches up front so the first job is as fast as the rest
+    conn = get_db_connection()
+    try:
+        context.dimensions.preload(conn)
+    finally:
+        return_db_connection(conn)
+
+    # Exit through the finally blocks on SIGTERM so the socket is removed and audit events are written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logging.info(f"Parking import daemon listening on {location}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Parking import daemon stopping")
+    finally:
+        server.server_close()
+        if context.parse_executor is not None:
+            context.parse_executor.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Import mParking MicropaymentMerchantReport files")
+    parser.add_argument("user_id", nargs="?", help="ID of the user running the import")
+    parser.add_argument(
+        "--verify-parser", nargs="+", metavar="FILE",
+        help="compare the vectorized report parser with the row-by-row parser and exit"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, metavar="N",
+        help="parse workbooks in N worker processes, each with its own connection pool (default: 1)"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="re-import files even if the import ledger shows identical content was already imported"
+    )
+    parser.add_argument(
+        "--serve", action="store_true",
+        help="run as a resident import daemon instead of importing the input folder once"
+    )
+    parser.add_argument(
+        "--socket", metavar="PATH", default=os.getenv("PARKING_IMPORT_SOCKET"),
+        help="Unix socket for --serve (default: $PARKING_IMPORT_SOCKET, else TCP)"
+    )
+    parser.add_argument(
+        "--progress-json", action="store_true",
+        help="write progress events as JSON lines to stdout and send log output to stderr"
+    )
+    parser.add_argument(
+        "--delta", action="store_true", default=DELTA_LOAD,
+        help="only insert new rows and update changed ones, leaving identical rows untouched (default: $PARKING_DELTA_LOAD)"
+    )
+    parser.add_argument(
+        "--delete-missing", action="store_true", default=DELETE_MISSING,
+        help="with --delta, delete rows in the re-imported date ranges that the reports no longer contain"
+    )
+    parser.add_argument(
+        "--atomic", action="store_true", default=ATOMIC_LOAD,
+        help="load each report in one transaction with savepoint-guarded chunks; rows that fail are "
+             "written to a reject file and the rest of the file commits (default: $PARKING_ATOMIC_LOAD)"
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, metavar="N", default=ATOMIC_CHUNK_ROWS,
+        help="rows per savepoint chunk with --atomic (default: $PARKING_ATOMIC_CHUNK_ROWS or 5000)"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true", default=PIPELINE,
+        help="overlap workbook parsing, database loads and file moves; each report is loaded in its "
+             "own transaction as soon as it is parsed (default: $PARKING_PIPELINE)"
+    )
+    parser.add_argument(
+        "--pipeline-queue", type=int, metavar="N", default=PIPELINE_QUEUE_SIZE,
+        help="parsed reports that may wait for the loader before parsing pauses (default: $PARKING_PIPELINE_QUEUE or 4)"
+    )
+    parser.add_argument(
+        "--stream", action="store_true", default=STREAM_LOAD,
+        help="load each report in its own transaction as soon as it is parsed and drop it, keeping "
+             "memory flat however many files are queued (default: $PARKING_STREAM)"
+    )
+    parser.add_argument(
+        "--rebuild-rollups", action="store_true",
+        help="recompute every ParkingMonthlyRollup row from ParkingTransaction and exit"
+    )
+    parser.add_argument(
+        "--export-parquet", action="store_true", default=EXPORT_PARQUET,
+        help="also write the normalized records to a Parquet dataset partitioned by provider and month "
+             "(default: $PARKING_EXPORT_PARQUET)"
+    )
+    parser.add_argument(
+        "--export-dir", metavar="DIR", default=EXPORT_DIR,
+        help="root of the Parquet dataset (default: $PARKING_EXPORT_DIR or scripts/data/parking_dataset/)"
+    )
+    parser.add_argument(
+        "--export-mode", choices=["replace", "append"], default=EXPORT_MODE,
+        help="replace the touched provider/month partitions or append a part file to them (default: replace)"
+    )
+    parser.add_argument(
+        "--no-parse-cache", dest="parse_cache", action="store_false", default=PARSE_CACHE,
+        help="always parse the workbooks instead of reading cached records (default: $PARKING_PARSE_CACHE)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", default=PROFILE,
+        help="time each pipeline stage (wall, CPU, tracemalloc peak) and log a summary table; "
+             "tracemalloc slows the run down; no peaks with --pipeline (default: $PARKING_PROFILE)"
+    )
+    parser.add_argument(
+        "--profile-dir", metavar="DIR", default=PROFILE_DIR,
+        help="write a cProfile dump per file to DIR (default: $PARKING_PROFILE_DIR)"
+    )
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="log how long module import, heavy imports and database/pool start-up took"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host for --serve (default: 127.0.0.1)")
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("PARKING_IMPORT_PORT", "8765")),
+        help="TCP port for --serve (default: $PARKING_IMPORT_PORT or 8765)"
+    )
+    args = parser.parse_args()
+    # The atomic loader upserts every row; it never runs the delta path
+    if args.atomic and (args.delta or args.delete_missing):
+        parser.error("--atomic cannot be combined with --delta/--delete-missing (check $PARKING_ATOMIC_LOAD/$PARKING_DELTA_LOAD)")
+    # Both replace the batch load with their own per-report loop; only one can drive the run
+    if args.stream and args.pipeline:
+        parser.error("--stream cannot be combined with --pipeline (check $PARKING_STREAM/$PARKING_PIPELINE)")
+    return args
+
+def preload_heavy_modules(timings):
+    """Import pandas, numpy and psycopg2 and record how long it took"""
+    started = time.perf_counter()
+    for module in HEAVY_MODULES:
+        module.load()
+    timings['heavy imports (background)'] = time.perf_counter() - started
+
+def log_startup_profile(timings):
+    """Log the start-up timings collected by main()"""
+    for stage, seconds in timings.items():
+        logging.info(f"Startup profile: {stage:<32} {seconds * 1000:8.1f} ms")
+
 def main():
     """Main function to process all files"""
+    global cli_args
+    cli_args = parse_args()
+    if cli_args.profile_dir:
+        # Pool workers dump their profiles here too
+        cli_args.profile_dir = os.path.abspath(cli_args.profile_dir)
+    # With --progress-json stdout carries only the event stream
+    configure_logging(sys.stderr if cli_args.progress_json else sys.stdout)
+    timings = {'module import': MODULE_IMPORTED - MODULE_IMPORT_STARTED}
+    
+    if cli_args.verify_parser:
+        if not verify_parser(cli_args.verify_parser):
+            sys.exit(1)
+        return
+    
+    ensure_folders()
+    # Import the data stack while the main thread waits on the database
+    loader = threading.Thread(target=preload_heavy_modules, args=(timings,), daemon=True)
+    loader.start()
+    
     try:
-        # Test database connection first
+        # Test database connection first; this opens the pool the run keeps using
+        started = time.perf_counter()
         if not test_database_connection():
             logging.error("Database connection failed. Exiting.")
             return
+        timings['database pool + health check'] = time.perf_counter() - started
         
-        # Initialize connection pool
-        init_db_pool()
+        # Resolve the acting user once
+        started = time.perf_counter()
+        context = init_run_context(cli_args)
+        if not context.user_id:
+            logging.error("No valid user ID available. Exiting.")
+            return
+        timings['run context'] = time.perf_counter() - started
+        if cli_args.progress_json:
+            context.progress = ProgressReporter(write_json_line)
         
-        # Get all Excel files from input folder
-        excel_files = glob.glob(os.path.join(FOLDER_PATH, "*.xlsx"))
-        excel_files.extend(glob.glob(os.path.join(FOLDER_PATH, "*.xls")))
+        loader.join()
+        timings['ready (since module import)'] = time.perf_counter() - MODULE_IMPORT_STARTED
+        if cli_args.startup_profile:
+            log_startup_profile(timings)
         
-        if not excel_files:
-            logging.info("No Excel files found in input folder")
+        if cli_args.rebuild_rollups:
+            rebuild_monthly_rollups()
             return
         
-        logging.info(f"Found {len(excel_files)} Excel files to process")
+        if cli_args.serve:
+            serve(context, cli_args.socket, cli_args.host, cli_args.port, cli_args.workers)
+            return
         
-        all_records = []
+        # Get all Excel files from input folder
+        excel_files = list_input_files()
         
-        for file_path in excel_files:
-            try:
-                logging.info(f"Processing file: {os.path.basename(file_path)}")
-                
-                # Process the Excel file
-                result = process_excel(file_path)
-                
-                if result and result.get('records'):
-                    all_records.extend(result['records'])
-                    
-                    # Move file to appropriate directory structure
-                    move_file_to_service_directory(
-                        file_path,
-                        result['parking_service_id'],
-                        result['provider_name'],
-                        result['filename'],
-                        result['current_user_id']
-                    )
-                    
-                    logging.info(f"Successfully processed and moved: {result['filename']}")
-                else:
-                    # Move to error folder if no records
-                    error_file = os.path.join(ERROR_FOLDER, os.path.basename(file_path))
-                    shutil.move(file_path, error_file)
-                    logging.warning(f"No records found, moved to error folder: {error_file}")
-                    
-            except Exception as e:
-                logging.error(f"Error processing file {os.path.basename(file_path)}: {e}")
-                # Move problematic file to error folder
-                try:
-                    error_file = os.path.join(ERROR_FOLDER, os.path.basename(file_path))
-                    shutil.move(file_path, error_file)
-                    logging.info(f"Moved problematic file to error folder: {error_file}")
-                except Exception as move_error:
-                    logging.error(f"Could not move file to error folder: {move_error}")
-                continue
+        if not excel_files:
+            logging.info("No Excel files found in input folder")
+            return
         
-        # Save all records to CSV
-        if all_records:
-            save_to_csv(all_records, OUTPUT_FILE)
-            logging.info(f"Saved {len(all_records)} records to {OUTPUT_FILE}")
-            
-            # Import to PostgreSQL
-            import_to_postgresql(OUTPUT_FILE)
-            logging.info("Data import to PostgreSQL completed")
-        else:
-            logging.info("No records to save")
+        run_import(context, excel_files, cli_args.force, cli_args.workers)
+        logging.info(f"Run summary: {context.summary()}")
             
     except Exception as e:
         logging.error(f"Main process error: {e}")
         raise
     finally:
+        # Write queued audit events even when the run failed
+        if run_context:
+            run_context.audit.flush()
         # Close connection pool
-        if connection_pool:
-            connection_pool.closeall()
-            logging.info("Database connection pool closed")
+        close_db_pool()
+
+MODULE_IMPORTED = time.perf_counter()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file